@@ -0,0 +1,16 @@
+import pytest
+
+
+# Shared by tests/ and benchmarks/, which pytest treats as separate roots
+# (benchmarks has its own pytest.ini), so a root conftest.py would not load
+REGION = 'ap-southeast-1'
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    from moto import mock_aws
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', REGION)
+    with mock_aws():
+        yield REGION
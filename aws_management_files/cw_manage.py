@@ -1,7 +1,12 @@
+import json
 import logging
 import random
+import sqlite3
 import uuid
 import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path, PosixPath
@@ -16,32 +21,39 @@ logging.basicConfig(
 log = logging.getLogger()
 
 
-def list_log_groups(group_name=None, region_name=None):
-    cwlogs = boto3.client('logs', region_name=region_name)
+def iter_log_groups(group_name=None, region_name=None, client=None):
+    cwlogs = client or boto3.client('logs', region_name=region_name)
     params = {
         'logGroupNamePrefix': group_name,
     } if group_name else {}
-    res = cwlogs.describe_log_groups(**params)
-    return res['logGroups']
+    for page in cwlogs.get_paginator('describe_log_groups').paginate(**params):
+        yield from page['logGroups']
 
 
-def list_log_group_streams(group_name, stream_name=None, region_name=None):
-    cwlogs = boto3.client('logs', region_name=region_name)
+def list_log_groups(group_name=None, region_name=None):
+    return list(iter_log_groups(group_name, region_name))
+
+
+def iter_log_group_streams(group_name, stream_name=None, region_name=None,
+                           client=None):
+    cwlogs = client or boto3.client('logs', region_name=region_name)
     params = {
         'logGroupName': group_name,
     } if group_name else {}
     if stream_name:
         params['logStreamNamePrefix'] = stream_name
-    res = cwlogs.describe_log_streams(**params)
-    return res['logStreams']
+    paginator = cwlogs.get_paginator('describe_log_streams')
+    for page in paginator.paginate(**params):
+        yield from page['logStreams']
 
 
-def filter_log_events(
-    group_name, filter_pat,
-    start=None, stop=None,
-    region_name=None
-):
-    cwlogs = boto3.client('logs', region_name=region_name)
+def list_log_group_streams(group_name, stream_name=None, region_name=None):
+    return list(iter_log_group_streams(group_name, stream_name, region_name))
+
+
+def iter_log_event_pages(group_name, filter_pat, start=None, stop=None,
+                         region_name=None, client=None):
+    cwlogs = client or boto3.client('logs', region_name=region_name)
     params = {
         'logGroupName': group_name,
         'filterPattern': filter_pat,
@@ -50,8 +62,278 @@ def filter_log_events(
         params['startTime'] = start
     if stop:
         params['endTime'] = stop
-    res = cwlogs.filter_log_events(**params)
-    return res['events']
+    paginator = cwlogs.get_paginator('filter_log_events')
+    for page in paginator.paginate(**params):
+        yield page['events']
+
+
+def iter_log_events(group_name, filter_pat, start=None, stop=None,
+                    region_name=None, client=None):
+    for events in iter_log_event_pages(
+            group_name, filter_pat, start, stop, region_name, client):
+        yield from events
+
+
+def time_slices(start, stop, slices):
+    # Disjoint [start, end] millisecond ranges covering [start, stop]
+    step = max(1, -(-(stop - start + 1) // slices))
+    for lo in range(start, stop + 1, step):
+        yield lo, min(stop, lo + step - 1)
+
+
+MAX_EVENT_AGE = 14 * 24 * 3600 * 1000
+
+
+def group_time_range(cwlogs, group_name, start=None, stop=None):
+    if start is None:
+        group = next((
+            g for g in iter_log_groups(group_name, client=cwlogs)
+            if g['logGroupName'] == group_name
+        ), None)
+        if group is None:
+            raise ValueError(f'Log group {group_name} not found')
+        created = group['creationTime']
+        # PutLogEvents accepts events up to 14 days older than the group
+        start = created - MAX_EVENT_AGE
+    if stop is None:
+        stop = int(datetime.now().timestamp() * 1000)
+    return start, stop
+
+
+def iter_log_events_parallel(group_name, filter_pat, start=None, stop=None,
+                             region_name=None, slices=8, workers=8):
+    cwlogs = boto3.client('logs', region_name=region_name)
+    start, stop = group_time_range(cwlogs, group_name, start, stop)
+
+    def fetch(lo, hi):
+        events = list(iter_log_events(
+            group_name, filter_pat, lo, hi, client=cwlogs))
+        # Events from several streams arrive interleaved within a slice
+        events.sort(key=lambda e: (e['timestamp'], e['eventId']))
+        return events
+
+    # Slices are fetched concurrently but yielded in time order, with at
+    # most two slices per worker held in memory
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for lo, hi in time_slices(start, stop, slices):
+            pending.append(pool.submit(fetch, lo, hi))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def filter_log_events(
+    group_name, filter_pat,
+    start=None, stop=None,
+    region_name=None,
+    slices=1, workers=8
+):
+    if slices > 1:
+        return iter_log_events_parallel(
+            group_name, filter_pat, start, stop, region_name, slices, workers)
+    return iter_log_events(group_name, filter_pat, start, stop, region_name)
+
+
+CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    group_name TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    stream TEXT,
+    timestamp INTEGER NOT NULL,
+    ingestion_time INTEGER,
+    message TEXT,
+    PRIMARY KEY (group_name, pattern, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_time
+    ON events (group_name, pattern, timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts
+    USING fts5(message, content='events', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts (rowid, message) VALUES (new.rowid, new.message);
+END;
+CREATE TABLE IF NOT EXISTS ranges (
+    group_name TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL
+);
+'''
+# Events this recent may still be ingested, so their range is not cached
+CACHE_SETTLE_MS = 5 * 60 * 1000
+
+
+def open_log_cache(cache_file):
+    db = sqlite3.connect(cache_file)
+    db.executescript(CACHE_SCHEMA)
+    return db
+
+
+def cached_ranges(db, group_name, pattern):
+    return db.execute(
+        'SELECT start, stop FROM ranges WHERE group_name = ? AND pattern = ? '
+        'ORDER BY start', (group_name, pattern)
+    ).fetchall()
+
+
+def missing_ranges(covered, start, stop):
+    gaps = []
+    for lo, hi in covered:
+        if hi < start:
+            continue
+        if lo > stop:
+            break
+        if lo > start:
+            gaps.append((start, lo - 1))
+        start = max(start, hi + 1)
+    if start <= stop:
+        gaps.append((start, stop))
+    return gaps
+
+
+def add_cached_range(db, group_name, pattern, start, stop):
+    merged = []
+    for lo, hi in sorted(cached_ranges(db, group_name, pattern)
+                         + [(start, stop)]):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    db.execute(
+        'DELETE FROM ranges WHERE group_name = ? AND pattern = ?',
+        (group_name, pattern))
+    db.executemany(
+        'INSERT INTO ranges VALUES (?, ?, ?, ?)',
+        [(group_name, pattern, lo, hi) for lo, hi in merged])
+
+
+def fill_log_cache(db, group_name, filter_pat, start, stop, region_name=None,
+                   slices=1, workers=8):
+    settled = int(time.time() * 1000) - CACHE_SETTLE_MS
+    gaps = missing_ranges(
+        cached_ranges(db, group_name, filter_pat), start, stop)
+    fetched = 0
+    for lo, hi in gaps:
+        events = filter_log_events(
+            group_name, filter_pat, lo, hi, region_name, slices, workers)
+        rows = (
+            (group_name, filter_pat, e['eventId'], e['logStreamName'],
+             e['timestamp'], e.get('ingestionTime'), e['message'])
+            for e in events
+        )
+        with db:
+            cur = db.executemany(
+                'INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows)
+            fetched += cur.rowcount
+            if lo <= settled:
+                add_cached_range(
+                    db, group_name, filter_pat, lo, min(hi, settled))
+    log.info(
+        f'Fetched {len(gaps)} uncached ranges, {fetched} new events')
+    return fetched
+
+
+def fts_phrase(text):
+    # Log terms like request-id or api/v1 are FTS5 syntax errors as bare
+    # queries, so plain searches match the text as one quoted phrase
+    return '"' + text.replace('"', '""') + '"'
+
+
+def query_log_cache(db, group_name, filter_pat, start, stop, search=None,
+                    stream_name=None, raw_search=False):
+    sql = (
+        'SELECT event_id, stream, timestamp, ingestion_time, message '
+        'FROM events WHERE group_name = ? AND pattern = ? '
+        'AND timestamp BETWEEN ? AND ?'
+    )
+    params = [group_name, filter_pat, start, stop]
+    if stream_name:
+        sql += ' AND stream = ?'
+        params.append(stream_name)
+    if search:
+        sql += (
+            ' AND rowid IN '
+            '(SELECT rowid FROM events_fts WHERE events_fts MATCH ?)'
+        )
+        params.append(search if raw_search else fts_phrase(search))
+    sql += ' ORDER BY timestamp, event_id'
+    for event_id, stream, ts, ingestion, message in db.execute(sql, params):
+        yield {
+            'logStreamName': stream,
+            'timestamp': ts,
+            'message': message,
+            'ingestionTime': ingestion,
+            'eventId': event_id,
+        }
+
+
+def cached_log_events(cache_file, group_name, filter_pat, start=None,
+                      stop=None, region_name=None, slices=1, workers=8,
+                      search=None, stream_name=None, offline=False,
+                      raw_search=False):
+    db = open_log_cache(cache_file)
+    # Closed even when the caller stops reading early or a fetch fails
+    try:
+        if start is None:
+            start = 0 if offline else group_time_range(
+                boto3.client('logs', region_name=region_name), group_name)[0]
+        if stop is None:
+            stop = int(time.time() * 1000)
+        if not offline:
+            fill_log_cache(
+                db, group_name, filter_pat, start, stop, region_name, slices,
+                workers)
+        yield from query_log_cache(
+            db, group_name, filter_pat, start, stop, search, stream_name,
+            raw_search)
+    finally:
+        db.close()
+
+
+def tail_log_events(group_name, filter_pat='', start=None, region_name=None,
+                    min_interval=1.0, max_interval=30.0, lookback=10000):
+    cwlogs = boto3.client('logs', region_name=region_name)
+    if start is None:
+        start = int(time.time() * 1000)
+    # Events can land a little behind the newest timestamp seen, so each
+    # poll re-reads the last `lookback` ms and drops IDs already printed
+    seen = {}
+    newest = start
+    interval = min_interval
+    while True:
+        since = max(start, newest - lookback)
+        found = False
+        # Events are printed page by page, so a long backlog starts
+        # streaming at once and only one page is held at a time
+        pages = iter_log_event_pages(
+            group_name, filter_pat, since, client=cwlogs)
+        for page in pages:
+            events = [e for e in page if e['eventId'] not in seen]
+            events.sort(key=lambda e: (e['timestamp'], e['eventId']))
+            for event in events:
+                seen[event['eventId']] = event['timestamp']
+                newest = max(newest, event['timestamp'])
+                found = True
+                yield event
+        # Pages are not in time order across a poll, so a later page may
+        # repeat an old ID; prune only once the poll is done
+        cutoff = newest - lookback
+        seen = {k: ts for k, ts in seen.items() if ts >= cutoff}
+        # Poll quickly while events flow, back off while the group is idle
+        if found:
+            interval = min_interval
+        else:
+            interval = min(max_interval, interval * 1.5)
+        time.sleep(interval)
+
+
+def format_log_event(event):
+    ts = datetime.fromtimestamp(event['timestamp'] / 1000)
+    return f"{ts:%Y-%m-%d %H:%M:%S} {event['logStreamName']} " \
+        f"{event['message'].rstrip()}"
 
 
 if __name__ == '__main__':
@@ -134,8 +416,101 @@ if __name__ == '__main__':
         '--region-name', '-R'
     )
     
+    sp_filter_log_events.add_argument(
+        '--slices',
+        type=int,
+        default=1,
+        help='Split the time range into this many concurrent queries.'
+    )
+    
+    sp_filter_log_events.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=8,
+        help='Number of concurrent time-slice queries.'
+    )
+    
+    sp_filter_log_events.add_argument(
+        '--cache', '-C',
+        help='SQLite file to cache events in, only uncached ranges are fetched.'
+    )
+    
+    sp_filter_log_events.add_argument(
+        '--search',
+        help='Full-text search of cached messages for this phrase '
+             '(requires --cache).'
+    )
+    
+    sp_filter_log_events.add_argument(
+        '--raw-search',
+        action='store_true',
+        help='Pass --search to SQLite as FTS5 query syntax, e.g. '
+             '\'timeout AND NOT retry\'.'
+    )
+    
+    sp_filter_log_events.add_argument(
+        '--stream-name', '-N',
+        help='Only return cached events from this stream (requires --cache).'
+    )
+    
+    sp_filter_log_events.add_argument(
+        '--offline',
+        action='store_true',
+        help='Answer from the cache without calling CloudWatch.'
+    )
+    
     sp_filter_log_events.set_defaults(func=filter_log_events)
     
+    
+    # Tail Log Events
+    sp_tail_log_events = subparsers.add_parser(
+        'tail',
+        help='Follow new events in a log group.'
+    )
+    
+    sp_tail_log_events.add_argument(
+        'group_name'
+    )
+    
+    sp_tail_log_events.add_argument(
+        'filter_pattern',
+        nargs='?',
+        default=''
+    )
+    
+    sp_tail_log_events.add_argument(
+        '--since', '-S',
+        type=int,
+        default=0,
+        help='Start this many seconds in the past.'
+    )
+    
+    sp_tail_log_events.add_argument(
+        '--min-interval',
+        type=float,
+        default=1.0,
+        help='Seconds between polls while events are arriving.'
+    )
+    
+    sp_tail_log_events.add_argument(
+        '--max-interval',
+        type=float,
+        default=30.0,
+        help='Longest wait between polls while the group is idle.'
+    )
+    
+    sp_tail_log_events.add_argument(
+        '--json',
+        action='store_true',
+        help='Print raw events as JSON lines.'
+    )
+    
+    sp_tail_log_events.add_argument(
+        '--region-name', '-R'
+    )
+    
+    sp_tail_log_events.set_defaults(func=tail_log_events)
+    
     pargs = parser.parse_args()
     action = pargs.func.__name__ if hasattr(pargs, 'func') else ''
     
@@ -146,11 +521,44 @@ if __name__ == '__main__':
         print(pargs.func(pargs.group_name, pargs.stream_name, pargs.region_name))
         sys.exit(0)
     elif action == 'filter_log_events':
-        print(pargs.func(
-            pargs.group_name, pargs.filter_pattern,
-            pargs.start, pargs.end, pargs.region_name
+        if pargs.cache:
+            events = cached_log_events(
+                pargs.cache, pargs.group_name, pargs.filter_pattern,
+                pargs.start, pargs.end, pargs.region_name,
+                pargs.slices, pargs.workers,
+                pargs.search, pargs.stream_name, pargs.offline,
+                pargs.raw_search
+            )
+        elif pargs.search or pargs.stream_name or pargs.offline:
+            print('--search, --stream-name and --offline need --cache.')
+            sys.exit(1)
+        else:
+            events = pargs.func(
+                pargs.group_name, pargs.filter_pattern,
+                pargs.start, pargs.end, pargs.region_name,
+                pargs.slices, pargs.workers
             )
+        try:
+            for event in events:
+                print(json.dumps(event))
+        except (ValueError, sqlite3.OperationalError) as err:
+            # sqlite3 reports malformed --raw-search queries this way
+            print(err)
+            sys.exit(1)
+        sys.exit(0)
+    elif action == 'tail_log_events':
+        start = int((time.time() - pargs.since) * 1000)
+        events = pargs.func(
+            pargs.group_name, pargs.filter_pattern, start, pargs.region_name,
+            pargs.min_interval, pargs.max_interval
         )
+        try:
+            for event in events:
+                line = json.dumps(event) if pargs.json \
+                    else format_log_event(event)
+                print(line, flush=True)
+        except KeyboardInterrupt:
+            pass
         sys.exit(0)
     else:
         print("Missing or Invalid Command.")
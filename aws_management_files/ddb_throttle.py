@@ -0,0 +1,143 @@
+import time
+import random
+import logging
+import threading
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+log = logging.getLogger()
+
+
+THROTTLE_ERRORS = (
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+)
+
+
+def is_throttle_error(err):
+    return isinstance(err, ClientError) and \
+        err.response['Error']['Code'] in THROTTLE_ERRORS
+
+
+def backoff(attempt, base=0.05, cap=5):
+    # Full jitter
+    time.sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+
+
+def consumed_units(res):
+    # Single-table calls return a dict, batch calls a list per table
+    consumed = res.get('ConsumedCapacity')
+    if consumed is None:
+        return None
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(c.get('CapacityUnits', 0) for c in consumed)
+
+
+class CapacityThrottle:
+    # Token bucket shared by every worker of a bulk job. Callers reserve
+    # an estimate before each request and settle it with the capacity the
+    # response reports; the bucket refills at `rate` units per second.
+    #
+    # With a known capacity the rate starts at target * capacity and never
+    # goes above it. Without one (on-demand tables) requests are unlimited
+    # until the first throttle, after which the observed rate is halved
+    # and then probed upwards again.
+    def __init__(self, capacity=None, target=0.8, min_rate=1.0,
+                 increase=0.05):
+        self.ceiling = capacity * target if capacity else None
+        self.rate = self.ceiling
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = self.rate or 0.0
+        self.unit_cost = 1.0
+        self.consumed = 0.0
+        self.throttles = 0
+        self._start = time.monotonic()
+        self._last = self._start
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate:
+            # At most one second of burst
+            self.tokens = min(
+                self.rate, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, count=1):
+        with self._lock:
+            estimate = count * self.unit_cost
+            if not self.rate:
+                return estimate
+            self._refill(time.monotonic())
+            self.tokens -= estimate
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return estimate
+
+    def record(self, estimate, consumed, count=1):
+        with self._lock:
+            if consumed is None:
+                consumed = estimate
+            self.consumed += consumed
+            if self.rate:
+                self.tokens += estimate - consumed
+            if count:
+                self.unit_cost = 0.8 * self.unit_cost + 0.2 * consumed / count
+
+    def success(self):
+        with self._lock:
+            if self.rate is None:
+                return
+            step = (self.ceiling or self.rate) * self.increase
+            self.rate = self.rate + step
+            if self.ceiling:
+                self.rate = min(self.ceiling, self.rate)
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            observed = self.consumed / max(now - self._start, 1e-3)
+            self.rate = max(self.min_rate, (self.rate or observed) / 2)
+            self.tokens = min(self.tokens, 0.0)
+            self._last = now
+
+    def stats(self):
+        elapsed = time.monotonic() - self._start
+        return {
+            'consumed_units': self.consumed,
+            'units_per_sec': self.consumed / elapsed if elapsed else 0,
+            'rate_limit': self.rate,
+            'throttles': self.throttles,
+        }
+
+
+def throttle_for_table(table_name, mode='write', target=0.8, client=None):
+    client = client or boto3.client('dynamodb')
+    table = client.describe_table(TableName=table_name)['Table']
+    throughput = table.get('ProvisionedThroughput', {})
+    key = 'WriteCapacityUnits' if mode == 'write' else 'ReadCapacityUnits'
+    capacity = throughput.get(key) or None
+    if table.get('BillingModeSummary', {}).get('BillingMode') \
+            == 'PAY_PER_REQUEST':
+        capacity = None
+    log.info(
+        f'{table_name} {mode} capacity: {capacity or "on-demand"}, '
+        f'target {target:.0%}'
+    )
+    return CapacityThrottle(capacity, target=target)
+
+
+def make_throttle(table_name, mode='write', target=None, client=None):
+    # None backs off adaptively once DynamoDB throttles, a share such as
+    # 0.8 paces to the table's capacity and 0 turns pacing off
+    if target is None:
+        return CapacityThrottle(None)
+    if not target:
+        return None
+    return throttle_for_table(table_name, mode, target, client)
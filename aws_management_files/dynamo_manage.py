@@ -1,10 +1,29 @@
+import base64
+import csv
+import gzip
 import json
 import sys
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
 
 import boto3
 from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.conditions import Key, Attr, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+
+from parallel_iter import iter_parallel, submit_bounded
+from ddb_throttle import (
+    THROTTLE_ERRORS, backoff, consumed_units, is_throttle_error,
+    make_throttle,
+)
 import operator as op
 
 
@@ -14,34 +33,65 @@ logging.basicConfig(
 log = logging.getLogger()
 
 
+TABLEDEF_KEYS = ['table_name', 'pk', 'pkdef']
+TABLEDEF_OPTIONAL_KEYS = ['billing_mode', 'throughput', 'gsi', 'ttl', 'stream']
+DEFAULT_THROUGHPUT = {
+    'ReadCapacityUnits': 5,
+    'WriteCapacityUnits': 5
+}
+
+
 def parse_tabledef(conf_file):
-    require_keys = [
-        'table_name',
-        'pk',
-        'pkdef',
-    ]
     with open(conf_file) as fh:
         conf = json.loads(fh.read())
-        if require_keys == list(conf.keys()):
-            return conf
-        else:
-            raise KeyError('Invalid configuration.')
+    missing = [k for k in TABLEDEF_KEYS if k not in conf]
+    unknown = [
+        k for k in conf if k not in TABLEDEF_KEYS + TABLEDEF_OPTIONAL_KEYS
+    ]
+    if missing or unknown:
+        raise KeyError(
+            f'Invalid configuration. Missing: {missing}, unknown: {unknown}')
+    return conf
 
 
-def create_dynamo_table(table_name, pk, pkdef):
+def create_dynamo_table(table_name, pk, pkdef, billing_mode='PROVISIONED',
+                        throughput=None, gsi=None, ttl=None, stream=None):
     ddb = boto3.resource('dynamodb')
-    table = ddb.create_table(
-        TableName=table_name,
-        KeySchema=pk,
-        AttributeDefinitions=pkdef,
-        ProvisionedThroughput={
-            'ReadCapacityUnits': 5,
-            'WriteCapacityUnits': 5
+    params = {
+        'TableName': table_name,
+        'KeySchema': pk,
+        'AttributeDefinitions': pkdef,
+        'BillingMode': billing_mode,
+    }
+    if billing_mode == 'PROVISIONED':
+        params['ProvisionedThroughput'] = throughput or DEFAULT_THROUGHPUT
+    if gsi:
+        indexes = []
+        for index in gsi:
+            index = dict(index)
+            index.setdefault('Projection', {'ProjectionType': 'ALL'})
+            if billing_mode == 'PROVISIONED':
+                index.setdefault(
+                    'ProvisionedThroughput', params['ProvisionedThroughput'])
+            indexes.append(index)
+        params['GlobalSecondaryIndexes'] = indexes
+    if stream:
+        params['StreamSpecification'] = {
+            'StreamEnabled': True,
+            'StreamViewType': stream
         }
-    )
+    table = ddb.create_table(**params)
     
     table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
     
+    if ttl:
+        # TTL can only be switched on once the table is active
+        table.meta.client.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': ttl}
+        )
+        log.info(f'Items in {table_name} expire on {ttl}')
+    
     return table
 
 
@@ -50,6 +100,51 @@ def get_dynamo_table(table_name):
     return ddb.Table(table_name)
 
 
+def new_dynamo_table(table_name):
+    # Resources are not thread-safe, so workers each build their own session
+    return boto3.session.Session().resource('dynamodb').Table(table_name)
+
+
+class QueryCache:
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = QueryCache()
+
+
+PRODUCT_KEYS = ['category', 'sku']
+BATCH_GET_SIZE = 100
+TRANSACT_WRITE_SIZE = 100
+# None runs bulk jobs flat out until the first throttle, then backs off
+DEFAULT_TARGET_UTILISATION = None
+
+
 def create_product(category, sku, **item):
     table = get_dynamo_table('products')
     keys = {
@@ -58,23 +153,201 @@ def create_product(category, sku, **item):
     }
     item.update(keys)
     table.put_item(Item=item)
-    return table.get_item(Key=keys)['Item']
+    return item
+
+
+def build_update(item):
+    # Placeholders for names as well, so reserved words like "name" work
+    fields = [k for k in item.keys() if k not in PRODUCT_KEYS]
+    if not fields:
+        raise ValueError(
+            f'No attributes to update for {[item.get(k) for k in PRODUCT_KEYS]}')
+    return {
+        'Key': {k: item[k] for k in PRODUCT_KEYS},
+        'UpdateExpression': 'SET ' + ', '.join(
+            f'#f{i}=:v{i}' for i in range(len(fields))),
+        'ExpressionAttributeNames': {
+            f'#f{i}': k for i, k in enumerate(fields)},
+        'ExpressionAttributeValues': {
+            f':v{i}': item[k] for i, k in enumerate(fields)},
+    }
 
 
 def update_product(category, sku, **item):
     table = get_dynamo_table('products')
-    keys = {
+    item.update({
         'category': category,
         'sku': sku,
-    }
-    expr = ', '.join([f'{k}=:{k}' for k in item.keys()])
-    vals = {f':{k}' : v for k, v in item.items()}
-    table.update_item(
-        Key=keys,
-        UpdateExpression=f'SET {expr}',
-        ExpressionAttributeValues=vals,
+    })
+    res = table.update_item(ReturnValues='ALL_NEW', **build_update(item))
+    return res['Attributes']
+
+
+def serialize(values):
+    serializer = TypeSerializer()
+    return {k: serializer.serialize(v) for k, v in values.items()}
+
+
+def deserialize(values):
+    deserializer = TypeDeserializer()
+    return {k: deserializer.deserialize(v) for k, v in values.items()}
+
+
+def transact_write(client, operations, retries=8, throttle=None):
+    for attempt in range(retries + 1):
+        if attempt:
+            backoff(attempt)
+        try:
+            # Transactional writes cost twice the capacity of plain ones
+            throttled_call(
+                throttle, client.transact_write_items, 2 * len(operations),
+                TransactItems=operations,
+            )
+            if throttle:
+                throttle.success()
+            return len(operations)
+        except ClientError as err:
+            code = err.response['Error']['Code']
+            if code in THROTTLE_ERRORS or code == 'TransactionInProgressException':
+                continue
+            reasons = err.response.get('CancellationReasons', [])
+            if code == 'TransactionCanceledException' and all(
+                    r.get('Code') in ('None', 'ThrottlingError',
+                                      'TransactionConflict')
+                    for r in reasons):
+                continue
+            raise
+    raise RuntimeError(f'Transaction still failing after {retries} retries')
+
+
+def iter_transactions(items, build_operation):
+    # A transaction may not touch the same item twice; the last one wins
+    batch = {}
+    for item in items:
+        batch[tuple(repr(item[k]) for k in PRODUCT_KEYS)] = \
+            build_operation(item)
+        if len(batch) == TRANSACT_WRITE_SIZE:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+def run_transactions(operations, workers=8,
+                     target_utilisation=DEFAULT_TARGET_UTILISATION):
+    client = boto3.client('dynamodb')
+    throttle = make_throttle(
+        'products', 'write', target_utilisation, client)
+    stats = {'written': 0, 'failed': 0, 'errors': []}
+
+    def done(batch, written, err):
+        if err:
+            log.error(f'Transaction of {len(batch)} items failed: {err}')
+            stats['failed'] += len(batch)
+            stats['errors'].append(str(err))
+            return
+        stats['written'] += written
+
+    # Transactions are streamed to the pool, at most two per worker waiting
+    submit_bounded(
+        partial(transact_write, client, throttle=throttle),
+        operations, done, workers,
     )
-    return table.get_item(Key=keys)['Item']
+    return stats
+
+
+def create_products(products, transactional=False, workers=8):
+    if not transactional:
+        return load_items(
+            'products', products, workers=workers, keys=PRODUCT_KEYS)
+
+    def put(item):
+        return {'Put': {'TableName': 'products', 'Item': serialize(item)}}
+    return run_transactions(iter_transactions(products, put), workers)
+
+
+def update_products(updates, workers=8):
+    skipped = []
+
+    def with_values(items):
+        # An empty SET fails validation and takes the whole transaction of
+        # 100 updates down with it, so key-only rows never reach a batch
+        for item in items:
+            if any(k not in PRODUCT_KEYS for k in item):
+                yield item
+                continue
+            key = [item.get(k) for k in PRODUCT_KEYS]
+            log.warning(f'Skipping update for {key}: no attributes to set')
+            skipped.append(key)
+
+    def update(item):
+        params = build_update(item)
+        params['Key'] = serialize(params['Key'])
+        params['ExpressionAttributeValues'] = serialize(
+            params['ExpressionAttributeValues'])
+        return {'Update': dict(params, TableName='products')}
+    stats = run_transactions(
+        iter_transactions(with_values(updates), update), workers)
+    stats['skipped'] = len(skipped)
+    return stats
+
+
+def batch_get(client, table_name, keys, projection=None, names=None,
+              retries=8, throttle=None):
+    request = {'Keys': keys}
+    if projection:
+        request['ProjectionExpression'] = projection
+    if names:
+        request['ExpressionAttributeNames'] = names
+    items = []
+    for attempt in range(retries + 1):
+        if attempt:
+            backoff(attempt)
+        try:
+            res = throttled_call(
+                throttle, client.batch_get_item, len(request['Keys']),
+                RequestItems={table_name: request},
+            )
+        except ClientError as err:
+            if is_throttle_error(err):
+                continue
+            raise
+        items.extend(res['Responses'].get(table_name, []))
+        unprocessed = res.get('UnprocessedKeys', {}).get(table_name)
+        if throttle:
+            throttle.throttled() if unprocessed else throttle.success()
+        if not unprocessed:
+            return items
+        request = unprocessed
+    raise RuntimeError(
+        f'{len(request["Keys"])} keys still unprocessed after {retries} retries')
+
+
+def get_products(keys, projection=None, names=None, workers=8,
+                 target_utilisation=DEFAULT_TARGET_UTILISATION):
+    client = boto3.client('dynamodb')
+    throttle = make_throttle(
+        'products', 'read', target_utilisation, client)
+    unique = {}
+    for key in keys:
+        key = {k: key[k] for k in PRODUCT_KEYS}
+        unique[tuple(repr(key[k]) for k in PRODUCT_KEYS)] = serialize(key)
+    unique = list(unique.values())
+    chunks = [
+        unique[i:i + BATCH_GET_SIZE]
+        for i in range(0, len(unique), BATCH_GET_SIZE)
+    ]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                batch_get, client, 'products', c, projection, names,
+                throttle=throttle)
+            for c in chunks
+        ]
+        for future in as_completed(futures):
+            for item in future.result():
+                yield deserialize(item)
 
 
 def delete_product(category, sku):
@@ -91,35 +364,503 @@ def delete_product(category, sku):
         return False
 
 
-def create_dynamo_items(table_name, items, keys=None):
-    table = get_dynamo_table(table_name)
-    params = {
-        'overwrite_by_keys': keys,
-    } if keys else {}
-    with table.batch_writer(**params) as batch:
-        for item in items:
-            batch.put_item(Item=item)
-    return True
+BATCH_WRITE_SIZE = 25
 
 
-def query_products(key_expr, filter_expr=None):
-    table = get_dynamo_table('products')
-    params = {
-        'KeyConditionExpression': key_expr,
+def convert_cell(value, attr_type=None):
+    # CSV cells are strings. With a known type the cell is converted to it;
+    # otherwise numbers become Decimal unless that would change their text
+    # (leading zeros, exponents)
+    if attr_type == 'S':
+        return value
+    if attr_type == 'N':
+        return Decimal(value)
+    if attr_type == 'B':
+        return base64.b64decode(value)
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return value
+    if number.is_finite() and str(number) == value:
+        return number
+    return value
+
+
+def table_attribute_types(table_name, client=None):
+    # Key attributes of the table and its indexes, which must never be
+    # guessed: an S key holding "12345" is rejected if sent as a number
+    client = client or boto3.client('dynamodb')
+    table = client.describe_table(TableName=table_name)['Table']
+    return {
+        a['AttributeName']: a['AttributeType']
+        for a in table['AttributeDefinitions']
     }
+
+
+def table_key_names(table_name, client=None):
+    client = client or boto3.client('dynamodb')
+    table = client.describe_table(TableName=table_name)['Table']
+    return [k['AttributeName'] for k in table['KeySchema']]
+
+
+def column_types(table_name, types=None):
+    # Explicit column types, with the table's key types taking precedence
+    return dict(types or {}, **table_attribute_types(table_name))
+
+
+def read_items(source='-', fmt=None, types=None):
+    types = types or {}
+    if fmt is None:
+        fmt = 'csv' if str(source).endswith('.csv') else 'jsonl'
+    fh = sys.stdin if source == '-' else open(source, newline='')
+    try:
+        if fmt == 'csv':
+            for row in csv.DictReader(fh):
+                yield {
+                    k: convert_cell(v, types.get(k))
+                    for k, v in row.items() if v != ''
+                }
+        else:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line, parse_float=Decimal)
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def throttled_call(throttle, call, count=1, **params):
+    # One request paced by the throttle and settled with the capacity the
+    # response reports. Throttling errors are left to the caller's retry.
+    if not throttle:
+        return call(**params)
+    estimate = throttle.acquire(count)
+    try:
+        res = call(ReturnConsumedCapacity='TOTAL', **params)
+    except ClientError as err:
+        throttle.record(estimate, 0, 0)
+        if is_throttle_error(err):
+            throttle.throttled()
+        raise
+    throttle.record(estimate, consumed_units(res), count)
+    return res
+
+
+def batch_write(client, table_name, requests, retries=8, throttle=None):
+    pending = requests
+    for attempt in range(retries + 1):
+        if attempt:
+            backoff(attempt)
+        try:
+            res = throttled_call(
+                throttle, client.batch_write_item, len(pending),
+                RequestItems={table_name: pending},
+            )
+        except ClientError as err:
+            if is_throttle_error(err):
+                continue
+            raise
+        pending = res.get('UnprocessedItems', {}).get(table_name, [])
+        if throttle:
+            # Unprocessed items are DynamoDB's way of throttling a batch
+            throttle.throttled() if pending else throttle.success()
+        if not pending:
+            return len(requests)
+    raise RuntimeError(
+        f'{len(pending)} items still unprocessed after {retries} retries')
+
+
+def iter_write_batches(items, keys=None, serialized=False):
+    serializer = TypeSerializer()
+    batch = {}
+    for item in items:
+        if not serialized:
+            item = {k: serializer.serialize(v) for k, v in item.items()}
+        # A batch may not hold the same key twice; the last one wins
+        key = tuple(repr(item.get(k)) for k in keys) if keys else len(batch)
+        batch[key] = {'PutRequest': {'Item': item}}
+        if len(batch) == BATCH_WRITE_SIZE:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+def load_items(table_name, items, workers=8, keys=None, serialized=False,
+               report_every=5, throttle=None,
+               target_utilisation=DEFAULT_TARGET_UTILISATION):
+    client = boto3.client('dynamodb')
+    if throttle is None:
+        throttle = make_throttle(
+            table_name, 'write', target_utilisation, client)
+    # BatchWriteItem rejects a batch that repeats a key, so batches are
+    # always de-duplicated on the table's own key unless told otherwise
+    keys = keys or table_key_names(table_name, client)
+    stats = {'written': 0, 'failed': 0}
+    start = time.monotonic()
+    last_report = [start]
+
+    def done(batch, written, err):
+        if err:
+            log.error(f'Batch write failed: {err}')
+            stats['failed'] += len(batch)
+            return
+        stats['written'] += written
+        now = time.monotonic()
+        if now - last_report[0] >= report_every:
+            last_report[0] = now
+            log.info(
+                f'Wrote {stats["written"]} items '
+                f'({stats["written"] / (now - start):.0f} items/s)'
+            )
+
+    submit_bounded(
+        partial(batch_write, client, table_name, throttle=throttle),
+        iter_write_batches(items, keys, serialized), done, workers,
+    )
+
+    elapsed = time.monotonic() - start
+    stats['items_per_sec'] = stats['written'] / elapsed if elapsed else 0
+    log.info(
+        f'Wrote {stats["written"]} items to {table_name} in {elapsed:.1f}s '
+        f'({stats["items_per_sec"]:.0f} items/s), {stats["failed"]} failed'
+    )
+    if throttle:
+        stats.update(throttle.stats())
+    return stats
+
+
+def create_dynamo_items(table_name, items, keys=None, workers=8,
+                        target_utilisation=DEFAULT_TARGET_UTILISATION):
+    stats = load_items(
+        table_name, items, workers=workers, keys=keys,
+        target_utilisation=target_utilisation,
+    )
+    return stats['failed'] == 0
+
+
+def expression_key(expr, is_key_condition=False):
+    # Condition objects are rendered so equal conditions share a cache key
+    if expr is None or isinstance(expr, str):
+        return expr
+    built = ConditionExpressionBuilder().build_expression(
+        expr, is_key_condition=is_key_condition)
+    return (
+        built.condition_expression,
+        sorted(built.attribute_name_placeholders.items()),
+        sorted((k, repr(v)) for k, v in
+               built.attribute_value_placeholders.items()),
+    )
+
+
+def query_cache_key(table_name, params, max_items):
+    parts = {k: v for k, v in params.items() if k not in (
+        'KeyConditionExpression', 'FilterExpression')}
+    return repr((
+        table_name,
+        expression_key(params['KeyConditionExpression'], True),
+        expression_key(params.get('FilterExpression')),
+        sorted((k, repr(v)) for k, v in parts.items()),
+        max_items,
+    ))
+
+
+def query_pages(table, params):
+    params = dict(params)
+    while True:
+        res = table.query(**params)
+        yield res
+        if 'LastEvaluatedKey' not in res:
+            return
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+
+def iter_query(table, params, max_items=None):
+    items = (item for page in query_pages(table, params)
+             for item in page['Items'])
+    return islice(items, max_items) if max_items else items
+
+
+def build_query_params(key_expr, reverse=False, consistent=False,
+                       index_name=None, **read_params):
+    params = build_read_params(**read_params)
+    params['KeyConditionExpression'] = key_expr
+    if index_name:
+        params['IndexName'] = index_name
+    if reverse:
+        params['ScanIndexForward'] = False
+    if consistent:
+        params['ConsistentRead'] = True
+    return params
+
+
+def run_query(table, table_name, params, max_items=None, cache=None):
+    # A cached answer may be up to the cache TTL old, which a strongly
+    # consistent read must never be
+    if cache is None or params.get('ConsistentRead'):
+        return iter_query(table, params, max_items)
+    key = query_cache_key(table_name, params, max_items)
+    items = cache.get(key)
+    if items is None:
+        items = list(iter_query(table, params, max_items))
+        cache.put(key, items)
+    return iter(items)
+
+
+def query_table(table_name, key_expr, max_items=None, cache=None,
+                **query_params):
+    params = build_query_params(key_expr, **query_params)
+    return run_query(
+        get_dynamo_table(table_name), table_name, params, max_items, cache)
+
+
+def query_table_many(table_name, key_exprs, workers=8, max_items=None,
+                     cache=None, **query_params):
+    # Items stream through a bounded queue as pages arrive, so a long
+    # query is never held in memory whole (a cached query still is, since
+    # the cache stores complete results)
+    def query(key_expr):
+        params = build_query_params(key_expr, **query_params)
+        table = new_dynamo_table(table_name)
+        yield from run_query(table, table_name, params, max_items, cache)
+
+    return iter_parallel(query, key_exprs, workers)
+
+
+def query_products(key_expr, filter_expr=None, cached=False, **query_params):
+    return query_table(
+        'products', key_expr, filter_expr=filter_expr,
+        cache=query_cache if cached else None, **query_params)
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def build_read_params(filter_expr=None, projection=None, names=None,
+                      values=None, page_size=None):
+    params = {}
     if filter_expr:
         params['FilterExpression'] = filter_expr
-    res = table.query(**params)
-    return res['Items']
+    if projection:
+        params['ProjectionExpression'] = projection
+    if names:
+        params['ExpressionAttributeNames'] = names
+    if values:
+        params['ExpressionAttributeValues'] = values
+    if page_size:
+        params['Limit'] = page_size
+    return params
 
 
-def scan_products(filter_expr):
-    table = get_dynamo_table('products')
+def scan_pages(table, params, throttle=None, retries=8):
+    params = dict(params)
+    while True:
+        for attempt in range(retries + 1):
+            if attempt:
+                backoff(attempt)
+            try:
+                res = throttled_call(throttle, table.scan, **params)
+                break
+            except ClientError as err:
+                if not is_throttle_error(err) or attempt == retries:
+                    raise
+        if throttle:
+            throttle.success()
+        yield res
+        if 'LastEvaluatedKey' not in res:
+            return
+        params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+
+def scan_table(table_name, segments=1,
+               target_utilisation=DEFAULT_TARGET_UTILISATION, **read_params):
+    params = build_read_params(**read_params)
+    # Every segment draws from the same read budget
+    throttle = make_throttle(
+        table_name, 'read', target_utilisation)
+    if segments <= 1:
+        for page in scan_pages(get_dynamo_table(table_name), params, throttle):
+            yield from page['Items']
+        return
+
+    # Each segment is scanned by its own worker; pages stream back through a
+    # bounded queue so memory stays flat however large the table is
+    def scan_segment(segment):
+        table = new_dynamo_table(table_name)
+        segment_params = dict(params, Segment=segment, TotalSegments=segments)
+        for page in scan_pages(table, segment_params, throttle):
+            yield page['Items']
+
+    pages = iter_parallel(
+        scan_segment, range(segments), segments, buffer_size=segments * 2)
+    for items in pages:
+        yield from items
+
+
+def scan_products(filter_expr=None, projection=None, segments=1, **params):
+    return scan_table(
+        'products', segments=segments,
+        filter_expr=filter_expr, projection=projection, **params
+    )
+
+
+EXPORT_MANIFEST = 'manifest.json'
+
+
+def encode_binary(value):
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def decode_binary(value):
+    # Reverses encode_binary inside DynamoDB JSON attribute values
+    if 'B' in value:
+        return {'B': base64.b64decode(value['B'])}
+    if 'BS' in value:
+        return {'BS': [base64.b64decode(v) for v in value['BS']]}
+    if 'M' in value:
+        return {'M': {k: decode_binary(v) for k, v in value['M'].items()}}
+    if 'L' in value:
+        return {'L': [decode_binary(v) for v in value['L']]}
+    return value
+
+
+def describe_tabledef(table_name):
+    client = boto3.client('dynamodb')
+    table = client.describe_table(TableName=table_name)['Table']
+    tabledef = {
+        'table_name': table_name,
+        'pk': table['KeySchema'],
+        'pkdef': table['AttributeDefinitions'],
+    }
+    billing = table.get('BillingModeSummary', {}).get('BillingMode')
+    if billing == 'PAY_PER_REQUEST':
+        tabledef['billing_mode'] = billing
+    else:
+        tabledef['throughput'] = {
+            k: table['ProvisionedThroughput'][k]
+            for k in ['ReadCapacityUnits', 'WriteCapacityUnits']
+        }
+    if table.get('GlobalSecondaryIndexes'):
+        tabledef['gsi'] = [
+            {k: index[k] for k in ['IndexName', 'KeySchema', 'Projection']}
+            for index in table['GlobalSecondaryIndexes']
+        ]
+    stream = table.get('StreamSpecification', {})
+    if stream.get('StreamEnabled'):
+        tabledef['stream'] = stream['StreamViewType']
+    ttl = client.describe_time_to_live(TableName=table_name)
+    ttl = ttl['TimeToLiveDescription']
+    if ttl.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        tabledef['ttl'] = ttl['AttributeName']
+    return tabledef
+
+
+def export_segment(client, table_name, segment, segments, out_dir,
+                   shard_items, throttle=None):
+    shards = []
+    out = None
     params = {
-        'FilterExpression': filter_expr,
+        'TableName': table_name,
+        'Segment': segment,
+        'TotalSegments': segments,
     }
-    res = table.scan(**params)
-    return res['Items']
+    try:
+        for res in scan_pages(client, params, throttle):
+            for item in res['Items']:
+                if out is None or shards[-1]['items'] >= shard_items:
+                    if out:
+                        out.close()
+                    name = f'part-{segment:04d}-{len(shards):04d}.jsonl.gz'
+                    out = gzip.open(out_dir.joinpath(name), 'wt')
+                    shards.append({'file': name, 'items': 0})
+                out.write(json.dumps({'Item': item}, default=encode_binary))
+                out.write('\n')
+                shards[-1]['items'] += 1
+        return shards
+    finally:
+        if out:
+            out.close()
+
+
+def export_table(table_name, out_dir, segments=4, shard_items=100000,
+                 target_utilisation=DEFAULT_TARGET_UTILISATION):
+    client = boto3.client('dynamodb')
+    throttle = make_throttle(
+        table_name, 'read', target_utilisation, client)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        futures = [
+            pool.submit(export_segment, client, table_name, i, segments,
+                        out_dir, shard_items, throttle)
+            for i in range(segments)
+        ]
+        shards = [shard for f in futures for shard in f.result()]
+
+    manifest = {
+        'table_name': table_name,
+        'tabledef': describe_tabledef(table_name),
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+        'format': 'dynamodb-json+gzip',
+        'item_count': sum(s['items'] for s in shards),
+        'shards': shards,
+    }
+    with open(out_dir.joinpath(EXPORT_MANIFEST), 'w') as fh:
+        fh.write(json.dumps(manifest, indent=4))
+    log.info(
+        f'Exported {manifest["item_count"]} items from {table_name} into '
+        f'{len(shards)} shards in {time.monotonic() - start:.1f}s'
+    )
+    return manifest
+
+
+def read_shards(in_dir, shards):
+    for shard in shards:
+        with gzip.open(Path(in_dir).joinpath(shard['file']), 'rt') as fh:
+            for line in fh:
+                item = json.loads(line)['Item']
+                yield {k: decode_binary(v) for k, v in item.items()}
+
+
+def table_exists(table_name):
+    try:
+        boto3.client('dynamodb').describe_table(TableName=table_name)
+        return True
+    except ClientError as err:
+        if err.response['Error']['Code'] == 'ResourceNotFoundException':
+            return False
+        raise
+
+
+def import_table(in_dir, table_name=None, workers=8,
+                 target_utilisation=DEFAULT_TARGET_UTILISATION):
+    with open(Path(in_dir).joinpath(EXPORT_MANIFEST)) as fh:
+        manifest = json.loads(fh.read())
+    table_name = table_name or manifest['table_name']
+
+    if not table_exists(table_name):
+        tabledef = dict(manifest['tabledef'], table_name=table_name)
+        log.info(f'Creating table {table_name}')
+        create_dynamo_table(**tabledef)
+
+    items = read_shards(in_dir, manifest['shards'])
+    stats = load_items(
+        table_name, items, workers=workers, serialized=True,
+        target_utilisation=target_utilisation,
+    )
+    if stats['written'] != manifest['item_count']:
+        log.warning(
+            f'Imported {stats["written"]} of {manifest["item_count"]} items')
+    return stats
 
 
 def delete_dynamo_table(table_name):
@@ -170,6 +911,76 @@ if __name__ == '__main__':
     
     sp_delete_dynamo_table.set_defaults(func=delete_dynamo_table)
     
+    sp_export_table = subparser.add_parser(
+        'export-table',
+        help='Export a table to gzipped JSON Lines shards with a manifest.'
+    )
+    
+    sp_export_table.add_argument(
+        'table_name'
+    )
+    
+    sp_export_table.add_argument(
+        'out_dir'
+    )
+    
+    sp_export_table.add_argument(
+        '--segments', '-S',
+        type=int,
+        default=4,
+        help='Parallel scan segments. Defaults to 4.'
+    )
+    
+    sp_export_table.add_argument(
+        '--shard-items',
+        type=int,
+        default=100000,
+        help='Items per shard file. Defaults to 100000.'
+    )
+    
+    sp_export_table.add_argument(
+        '--target-utilisation', '-U',
+        type=float,
+        default=DEFAULT_TARGET_UTILISATION,
+        help='Pace requests to this share of the table capacity, e.g. 0.8. '
+             'By default requests back off adaptively once DynamoDB '
+             'throttles; 0 turns pacing off.'
+    )
+    
+    sp_export_table.set_defaults(func=export_table)
+    
+    sp_import_table = subparser.add_parser(
+        'import-table',
+        help='Import an export-table directory, creating the table if needed.'
+    )
+    
+    sp_import_table.add_argument(
+        'in_dir'
+    )
+    
+    sp_import_table.add_argument(
+        '--table-name', '-T',
+        help='Target table. Defaults to the exported table name.'
+    )
+    
+    sp_import_table.add_argument(
+        '--workers', '-W',
+        type=int,
+        default=8,
+        help='Parallel batch writers. Defaults to 8.'
+    )
+    
+    sp_import_table.add_argument(
+        '--target-utilisation', '-U',
+        type=float,
+        default=DEFAULT_TARGET_UTILISATION,
+        help='Pace requests to this share of the table capacity, e.g. 0.8. '
+             'By default requests back off adaptively once DynamoDB '
+             'throttles; 0 turns pacing off.'
+    )
+    
+    sp_import_table.set_defaults(func=import_table)
+    
     sp_create_product = subparser.add_parser(
         'create-product',
         help='Create a new Product Entry'
@@ -229,21 +1040,263 @@ if __name__ == '__main__':
     
     sp_delete_product.set_defaults(func=delete_product)
     
+    sp_create_products = subparser.add_parser(
+        'create-products',
+        help='Create products from a JSON Lines or CSV file, or stdin.'
+    )
+    
+    sp_create_products.add_argument(
+        'products',
+        nargs='?',
+        default='-'
+    )
+    
+    sp_create_products.add_argument(
+        '--types',
+        type=json.loads,
+        help='CSV column types (JSON), e.g. \'{"price": "N", "code": "S"}\'. '
+             'Key attribute types always come from the table.'
+    )
+    
+    sp_create_products.add_argument(
+        '--format', '-F',
+        choices=['jsonl', 'csv']
+    )
+    
+    sp_create_products.add_argument(
+        '--transactional', '-T',
+        action='store_true',
+        help='Write in all-or-nothing chunks of 100 with TransactWriteItems.'
+    )
+    
+    sp_create_products.set_defaults(func=create_products)
+    
+    sp_update_products = subparser.add_parser(
+        'update-products',
+        help='Update products from a JSON Lines or CSV file, or stdin.'
+    )
+    
+    sp_update_products.add_argument(
+        'updates',
+        nargs='?',
+        default='-'
+    )
+    
+    sp_update_products.add_argument(
+        '--types',
+        type=json.loads,
+        help='CSV column types (JSON), e.g. \'{"price": "N", "code": "S"}\'. '
+             'Key attribute types always come from the table.'
+    )
+    
+    sp_update_products.add_argument(
+        '--format', '-F',
+        choices=['jsonl', 'csv']
+    )
+    
+    sp_update_products.set_defaults(func=update_products)
+    
+    sp_get_products = subparser.add_parser(
+        'get-products',
+        help='Fetch products by category and sku (JSON Lines or CSV keys).'
+    )
+    
+    sp_get_products.add_argument(
+        'keys',
+        nargs='?',
+        default='-'
+    )
+    
+    sp_get_products.add_argument(
+        '--types',
+        type=json.loads,
+        help='CSV column types (JSON), e.g. \'{"price": "N", "code": "S"}\'. '
+             'Key attribute types always come from the table.'
+    )
+    
+    sp_get_products.add_argument(
+        '--format', '-F',
+        choices=['jsonl', 'csv']
+    )
+    
+    sp_get_products.add_argument(
+        '--projection', '-P'
+    )
+    
+    sp_get_products.set_defaults(func=get_products)
+    
     sp_create_dynamo_items = subparser.add_parser(
-        'create-dynamo-items'
+        'create-dynamo-items',
+        help='Bulk load items from a JSON Lines or CSV file, or stdin.'
     )
     
     sp_create_dynamo_items.add_argument('table_name')
     
-    sp_create_dynamo_items.add_argument('items')
+    sp_create_dynamo_items.add_argument(
+        'items',
+        nargs='?',
+        default='-',
+        help='JSON Lines or CSV file. Reads stdin when omitted or "-".'
+    )
+    
+    sp_create_dynamo_items.add_argument(
+        '--types',
+        type=json.loads,
+        help='CSV column types (JSON), e.g. \'{"price": "N", "code": "S"}\'. '
+             'Key attribute types always come from the table.'
+    )
+    
+    sp_create_dynamo_items.add_argument(
+        '--format', '-F',
+        choices=['jsonl', 'csv'],
+        help='Input format. Guessed from the file extension by default.'
+    )
+    
+    sp_create_dynamo_items.add_argument(
+        '--keys',
+        type=lambda s: s.split(','),
+        help='Comma separated attributes to de-duplicate on, defaults to '
+             'the table key; duplicates keep the last item.'
+    )
+    
+    sp_create_dynamo_items.add_argument(
+        '--workers', '-W',
+        type=int,
+        default=8,
+        help='Parallel batch writers. Defaults to 8.'
+    )
     
-    sp_create_dynamo_items.add_argument('--keys')
+    sp_create_dynamo_items.add_argument(
+        '--target-utilisation', '-U',
+        type=float,
+        default=DEFAULT_TARGET_UTILISATION,
+        help='Pace requests to this share of the table capacity, e.g. 0.8. '
+             'By default requests back off adaptively once DynamoDB '
+             'throttles; 0 turns pacing off.'
+    )
     
     sp_create_dynamo_items.set_defaults(func=create_dynamo_items)
     
-    sp_query_products = subparser.add_parser('query-products')
+    sp_query_products = subparser.add_parser(
+        'query-products',
+        help='Query products by category, printed as JSON Lines.'
+    )
+    
+    sp_query_products.add_argument(
+        'categories',
+        nargs='+',
+        help='One or more categories, queried in parallel.'
+    )
+    
+    sp_query_products.add_argument(
+        '--sku-prefix', '-K',
+        help='Only SKUs starting with this value.'
+    )
+    
+    sp_query_products.add_argument(
+        '--filter', '-F',
+        help='Filter expression, e.g. "stock < :min"'
+    )
+    
+    sp_query_products.add_argument(
+        '--values', '-V',
+        type=lambda s: json.loads(s, parse_float=Decimal),
+        help='Expression attribute values (JSON).'
+    )
+    
+    sp_query_products.add_argument(
+        '--names', '-N',
+        type=json.loads,
+        help='Expression attribute names (JSON).'
+    )
+    
+    sp_query_products.add_argument(
+        '--projection', '-P'
+    )
+    
+    sp_query_products.add_argument(
+        '--limit', '-L',
+        type=int,
+        help='Items evaluated per request.'
+    )
+    
+    sp_query_products.add_argument(
+        '--max-items', '-M',
+        type=int,
+        help='Items returned per category.'
+    )
+    
+    sp_query_products.add_argument(
+        '--reverse', '-R',
+        action='store_true',
+        help='Descending SKU order.'
+    )
+    
+    sp_query_products.add_argument(
+        '--consistent', '-C',
+        action='store_true',
+        help='Strongly consistent reads.'
+    )
+    
+    sp_query_products.add_argument(
+        '--cache',
+        action='store_true',
+        help='Serve repeated queries from an in-process cache for '
+             f'{query_cache.ttl}s; never used with --consistent.'
+    )
+    
+    sp_query_products.add_argument(
+        '--workers', '-W',
+        type=int,
+        default=8
+    )
+    
+    sp_query_products.set_defaults(func=query_products)
+    
+    sp_scan_products = subparser.add_parser(
+        'scan-products',
+        help='Scan every product, printed as JSON Lines.'
+    )
+    
+    sp_scan_products.add_argument(
+        '--filter', '-F',
+        help='Filter expression, e.g. "stock < :min"'
+    )
     
-    sp_scan_products = subparser.add_parser('scan-products')
+    sp_scan_products.add_argument(
+        '--values', '-V',
+        type=lambda s: json.loads(s, parse_float=Decimal),
+        help='Expression attribute values (JSON), e.g. \'{":min": 5}\''
+    )
+    
+    sp_scan_products.add_argument(
+        '--names', '-N',
+        type=json.loads,
+        help='Expression attribute names (JSON), e.g. \'{"#n": "name"}\''
+    )
+    
+    sp_scan_products.add_argument(
+        '--projection', '-P',
+        help='Attributes to return, e.g. "category, sku, #n"'
+    )
+    
+    sp_scan_products.add_argument(
+        '--segments', '-S',
+        type=int,
+        default=4,
+        help='Parallel scan segments. Defaults to 4.'
+    )
+    
+    sp_scan_products.add_argument(
+        '--target-utilisation', '-U',
+        type=float,
+        default=DEFAULT_TARGET_UTILISATION,
+        help='Pace requests to this share of the table capacity, e.g. 0.8. '
+             'By default requests back off adaptively once DynamoDB '
+             'throttles; 0 turns pacing off.'
+    )
+    
+    sp_scan_products.set_defaults(func=scan_products)
     
     pargs = parser.parse_args()
     action = pargs.func.__name__ if hasattr(pargs, 'func') else ''
@@ -269,8 +1322,81 @@ if __name__ == '__main__':
     elif action == 'delete_product':
         print(pargs.func(pargs.category, pargs.sku))
         sys.exit(0)
+    elif action == 'export_table':
+        manifest = pargs.func(
+            pargs.table_name, pargs.out_dir, pargs.segments, pargs.shard_items,
+            pargs.target_utilisation)
+        print(f'{manifest["item_count"]} items, {len(manifest["shards"])} shards')
+        sys.exit(0)
+    elif action == 'import_table':
+        stats = pargs.func(
+            pargs.in_dir, pargs.table_name, pargs.workers,
+            pargs.target_utilisation)
+        print(stats)
+        sys.exit(1 if stats['failed'] else 0)
+    elif action == 'create_products':
+        products = read_items(
+            pargs.products, pargs.format,
+            column_types('products', pargs.types))
+        stats = pargs.func(products, pargs.transactional)
+        print(stats)
+        sys.exit(1 if stats['failed'] else 0)
+    elif action == 'update_products':
+        updates = read_items(
+            pargs.updates, pargs.format,
+            column_types('products', pargs.types))
+        stats = pargs.func(updates)
+        print(stats)
+        sys.exit(1 if stats['failed'] else 0)
+    elif action == 'get_products':
+        items = pargs.func(
+            read_items(
+                pargs.keys, pargs.format,
+                column_types('products', pargs.types)),
+            pargs.projection)
+        for item in items:
+            print(json.dumps(item, default=json_default))
+        sys.exit(0)
     elif action == 'create_dynamo_items':
-        print(pargs.func(pargs.table_name, pargs.items, pargs.keys))
+        items = read_items(
+            pargs.items, pargs.format,
+            column_types(pargs.table_name, pargs.types))
+        stats = load_items(
+            pargs.table_name, items, workers=pargs.workers, keys=pargs.keys,
+            target_utilisation=pargs.target_utilisation)
+        print(stats)
+        sys.exit(1 if stats['failed'] else 0)
+    elif action == 'query_products':
+        key_exprs = []
+        for category in pargs.categories:
+            key_expr = Key('category').eq(category)
+            if pargs.sku_prefix:
+                key_expr = key_expr & Key('sku').begins_with(pargs.sku_prefix)
+            key_exprs.append(key_expr)
+        items = query_table_many(
+            'products', key_exprs,
+            workers=pargs.workers,
+            max_items=pargs.max_items,
+            filter_expr=pargs.filter,
+            projection=pargs.projection,
+            names=pargs.names,
+            values=pargs.values,
+            page_size=pargs.limit,
+            reverse=pargs.reverse,
+            consistent=pargs.consistent,
+            cache=query_cache if pargs.cache else None,
+        )
+        for item in items:
+            print(json.dumps(item, default=json_default))
+        sys.exit(0)
+    elif action == 'scan_products':
+        items = pargs.func(
+            pargs.filter, pargs.projection, pargs.segments,
+            names=pargs.names, values=pargs.values,
+            target_utilisation=pargs.target_utilisation
+        )
+        for item in items:
+            print(json.dumps(item, default=json_default))
         sys.exit(0)
     else:
         print('Invalid or Missing Command.')
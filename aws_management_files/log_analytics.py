@@ -0,0 +1,385 @@
+import sys
+import json
+import heapq
+import random
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from boto3.dynamodb.conditions import Key
+
+from dynamo_manage import (
+    DEFAULT_TARGET_UTILISATION, query_table, query_table_many, scan_table,
+)
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s %(module)s %(lineno)d - %(message)s')
+log = logging.getLogger()
+
+
+LOGS_TABLE = 'application_logs_jed'
+ROLLUP_TABLE = 'application_logs_rollups_jed'
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+# Must match LOG_DAY_SHARDS in the logginator
+LOG_DAY_SHARDS = 10
+# Prefix lengths of 'YYYY-MM-DD HH:MM:SS.ffffff' timestamps
+BUCKETS = {
+    'minute': 16,
+    'hour': 13,
+    'day': 10,
+}
+PROJECTION = 'log_level, source_application, #ts, message'
+PROJECTION_NAMES = {'#ts': 'timestamp'}
+
+
+class CountMinSketch:
+    # Fixed-size frequency estimates; counts are never under-estimated and
+    # over-estimated by at most total / width with high probability
+    def __init__(self, width=2048, depth=4, seed=None):
+        rng = random.Random(seed)
+        self.width = width
+        self.salts = [rng.getrandbits(64) for _ in range(depth)]
+        self.rows = [[0] * width for _ in range(depth)]
+        self.total = 0
+
+    def _cells(self, key):
+        for row, salt in zip(self.rows, self.salts):
+            yield row, hash((salt, key)) % self.width
+
+    def add(self, key, count=1):
+        self.total += count
+        estimate = None
+        for row, i in self._cells(key):
+            row[i] += count
+            estimate = row[i] if estimate is None else min(estimate, row[i])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[i] for row, i in self._cells(key))
+
+
+class HeavyHitters:
+    # Top-n keys by count-min estimate, keeping at most `capacity` candidates.
+    # A min-heap finds the weakest candidate; entries go stale as estimates
+    # grow and are skipped when they reach the top
+    def __init__(self, n=10, capacity=None, width=2048, depth=4):
+        self.n = n
+        self.capacity = capacity or n * 10
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+        self._heap = []
+        self._live = {}
+        self._seq = 0
+
+    def _track(self, key, estimate):
+        self.candidates[key] = estimate
+        self._seq += 1
+        self._live[key] = self._seq
+        # The sequence number breaks ties, keys may not be comparable
+        heapq.heappush(self._heap, (estimate, self._seq, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [
+                (e, self._live[k], k) for k, e in self.candidates.items()]
+            heapq.heapify(self._heap)
+
+    def _smallest(self):
+        while True:
+            estimate, seq, key = self._heap[0]
+            if self._live.get(key) == seq:
+                return key, estimate
+            heapq.heappop(self._heap)
+
+    def add(self, key, count=1):
+        estimate = self.sketch.add(key, count)
+        if key in self.candidates or len(self.candidates) < self.capacity:
+            self._track(key, estimate)
+            return
+        smallest, lowest = self._smallest()
+        if estimate > lowest:
+            heapq.heappop(self._heap)
+            del self.candidates[smallest]
+            del self._live[smallest]
+            self._track(key, estimate)
+
+    def top(self):
+        ranked = sorted(
+            self.candidates.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:self.n]
+
+
+class LogAggregator:
+    def __init__(self, bucket='hour', top_n=10):
+        self.prefix = BUCKETS[bucket]
+        self.events = 0
+        self.levels = Counter()
+        # Buckets are bounded by the time range, applications and messages
+        # are not, so those two only keep sketches and candidate heaps
+        self.buckets = Counter()
+        self.applications = HeavyHitters(top_n)
+        self.messages = HeavyHitters(top_n)
+
+    def add(self, item):
+        self.events += 1
+        self.levels[item.get('log_level')] += 1
+        self.buckets[item.get('timestamp', '')[:self.prefix]] += 1
+        self.applications.add(item.get('source_application'))
+        self.messages.add(item.get('message'))
+
+    def report(self):
+        return {
+            'events': self.events,
+            'levels': dict(self.levels.most_common()),
+            'buckets': dict(sorted(self.buckets.items())),
+            'top_applications': self.applications.top(),
+            'top_messages': self.messages.top(),
+        }
+
+
+def in_range(key_expr, start=None, stop=None):
+    if start and stop:
+        return key_expr & Key('timestamp').between(start, stop)
+    if start:
+        return key_expr & Key('timestamp').gte(start)
+    if stop:
+        return key_expr & Key('timestamp').lte(stop)
+    return key_expr
+
+
+def iter_log_items(levels=None, start=None, stop=None, application=None,
+                   segments=4, workers=8,
+                   target_utilisation=DEFAULT_TARGET_UTILISATION, day=None):
+    read_params = {'projection': PROJECTION, 'names': PROJECTION_NAMES}
+
+    if day:
+        items = iter_log_day(day, start, stop, workers)
+        if application:
+            items = (
+                i for i in items if i.get('source_application') == application)
+        if levels:
+            items = (i for i in items if i.get('log_level') in levels)
+        return items
+    if application:
+        key_exprs = [
+            in_range(Key('source_application').eq(application), start, stop)]
+        items = query_table_many(
+            LOGS_TABLE, key_exprs, workers, index_name='by_source_application',
+            **read_params)
+        if levels:
+            items = (i for i in items if i.get('log_level') in levels)
+        return items
+    if levels or start or stop:
+        # The key is (log_level, timestamp), so one query per level
+        key_exprs = [
+            in_range(Key('log_level').eq(level), start, stop)
+            for level in levels or LOG_LEVELS
+        ]
+        return query_table_many(LOGS_TABLE, key_exprs, workers, **read_params)
+    return scan_table(
+        LOGS_TABLE, segments, target_utilisation=target_utilisation,
+        **read_params)
+
+
+def iter_log_day(day, start=None, stop=None, workers=8):
+    # One query per by_day shard; day is 'YYYY-MM-DD'
+    key_exprs = [
+        in_range(Key('log_day').eq(f'{day}#{shard}'), start, stop)
+        for shard in range(LOG_DAY_SHARDS)
+    ]
+    return query_table_many(
+        LOGS_TABLE, key_exprs, workers, index_name='by_day',
+        projection=PROJECTION, names=PROJECTION_NAMES)
+
+
+def log_analytics(levels=None, start=None, stop=None, application=None,
+                  bucket='hour', top_n=10, segments=4, workers=8,
+                  target_utilisation=DEFAULT_TARGET_UTILISATION, day=None):
+    aggregator = LogAggregator(bucket, top_n)
+    items = iter_log_items(
+        levels, start, stop, application, segments, workers,
+        target_utilisation, day)
+    for item in items:
+        aggregator.add(item)
+    return aggregator.report()
+
+
+def rollup_series(level, application, granularity, first, last):
+    # Buckets are strings in the rollup's own resolution, both ends included
+    key_expr = Key('rollup').eq(f'{level}#{application}#{granularity}') \
+        & Key('bucket').between(first, last)
+    return [
+        (item['bucket'], int(item['event_count']))
+        for item in query_table(ROLLUP_TABLE, key_expr)
+    ]
+
+
+def rollup_count(level, application, start, stop):
+    # Whole hours are read from hourly rollups and only the ragged ends
+    # from minute rollups, so a day costs at most 24 + 2 * 59 items.
+    # Rollups have no finer resolution than a minute: start and stop are
+    # rounded down to their minute and both end minutes count in full, so
+    # 09:00:30 to 09:59:10 counts every event from 09:00:00 to 09:59:59
+    first = start.replace(second=0, microsecond=0)
+    end = stop.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    hour_start = first.replace(minute=0)
+    if hour_start < first:
+        hour_start += timedelta(hours=1)
+    hour_end = end.replace(minute=0)
+    ranges = []
+    if hour_start < hour_end:
+        ranges.append(('minute', first, hour_start - timedelta(minutes=1)))
+        ranges.append(('hour', hour_start, hour_end - timedelta(hours=1)))
+        ranges.append(('minute', hour_end, end - timedelta(minutes=1)))
+    else:
+        ranges.append(('minute', first, end - timedelta(minutes=1)))
+    fmt = {'minute': '%Y-%m-%d %H:%M', 'hour': '%Y-%m-%d %H'}
+    total = 0
+    for granularity, lo, hi in ranges:
+        if lo > hi:
+            continue
+        series = rollup_series(
+            level, application, granularity,
+            lo.strftime(fmt[granularity]), hi.strftime(fmt[granularity]))
+        total += sum(count for _, count in series)
+    return total
+
+
+def format_report(report):
+    lines = [f'Events: {report["events"]}', '']
+
+    def section(title, rows):
+        rows = [(str(k), str(v)) for k, v in rows]
+        width = max([len(title)] + [len(k) for k, _ in rows])
+        lines.append(f'{title:<{width}}  COUNT')
+        lines.extend(f'{k:<{width}}  {v}' for k, v in rows)
+        lines.append('')
+
+    section('LEVEL', report['levels'].items())
+    section('BUCKET', report['buckets'].items())
+    section('APPLICATION (approx.)', report['top_applications'])
+    section('MESSAGE (approx.)', [
+        (m if len(m or '') <= 60 else m[:57] + '...', c)
+        for m, c in report['top_messages']
+    ])
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Counts and top messages for the Logginator logs table.'
+    )
+
+    parser.add_argument(
+        '--levels', '-l',
+        nargs='+',
+        choices=LOG_LEVELS,
+        help='Only count these levels, queried instead of scanned.'
+    )
+
+    parser.add_argument(
+        '--start', '-S',
+        type=lambda s: str(datetime.strptime(s, '%Y-%m-%d %H:%M:%S')),
+        help='Earliest timestamp, e.g. "2021-06-01 00:00:00"'
+    )
+
+    parser.add_argument(
+        '--end', '-E',
+        type=lambda s: str(datetime.strptime(s, '%Y-%m-%d %H:%M:%S')),
+        help='Latest timestamp, e.g. "2021-06-02 00:00:00"'
+    )
+
+    parser.add_argument(
+        '--day', '-d',
+        type=lambda s: datetime.strptime(s, '%Y-%m-%d').strftime('%Y-%m-%d'),
+        help='Only count one day, e.g. "2021-06-01", read from the by_day '
+             'index.'
+    )
+
+    parser.add_argument(
+        '--application', '-a',
+        help='Only count one source_application, via its index.'
+    )
+
+    parser.add_argument(
+        '--bucket', '-b',
+        choices=list(BUCKETS),
+        default='hour',
+        help='Time bucket size. Defaults to hour.'
+    )
+
+    parser.add_argument(
+        '--top', '-n',
+        type=int,
+        default=10,
+        help='Number of top applications and messages.'
+    )
+
+    parser.add_argument(
+        '--segments',
+        type=int,
+        default=4,
+        help='Parallel scan segments when no level or time range is given.'
+    )
+
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=8,
+        help='Concurrent queries.'
+    )
+
+    parser.add_argument(
+        '--target-utilisation', '-U',
+        type=float,
+        default=DEFAULT_TARGET_UTILISATION,
+        help='Pace scans to this share of the table read capacity, e.g. 0.8. '
+             'By default scans back off adaptively once DynamoDB throttles; '
+             '0 turns pacing off.'
+    )
+
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Print the report as JSON.'
+    )
+
+    parser.add_argument(
+        '--rollups',
+        action='store_true',
+        help='Count --levels for --application between --start and --end '
+             'from the rollup table instead of reading raw logs. Counts '
+             'whole minutes: seconds are ignored and the --end minute is '
+             'included.'
+    )
+
+    pargs = parser.parse_args()
+
+    if pargs.rollups:
+        if not (pargs.application and pargs.start and pargs.end):
+            print('--rollups needs --application, --start and --end.')
+            sys.exit(1)
+        start = datetime.fromisoformat(pargs.start)
+        stop = datetime.fromisoformat(pargs.end)
+        counts = {
+            level: rollup_count(level, pargs.application, start, stop)
+            for level in pargs.levels or LOG_LEVELS
+        }
+        if pargs.json:
+            print(json.dumps(counts, indent=4))
+        else:
+            for level, count in counts.items():
+                print(f'{level:<8}  {count}')
+        sys.exit(0)
+
+    report = log_analytics(
+        pargs.levels, pargs.start, pargs.end, pargs.application,
+        pargs.bucket, pargs.top, pargs.segments, pargs.workers,
+        pargs.target_utilisation, pargs.day
+    )
+    if pargs.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report))
+    sys.exit(0)
@@ -0,0 +1,92 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class _Done:
+    pass
+
+
+class _Failed:
+    def __init__(self, err):
+        self.err = err
+
+
+def iter_parallel(produce, sources, workers=8, buffer_size=16):
+    # Runs produce(source) for every source on a pool and yields whatever
+    # the generators yield, in arrival order. Results stream through a
+    # bounded queue, so a slow consumer holds back the producers instead
+    # of letting results pile up in memory.
+    #
+    # The first producer error is raised in the consumer as soon as it is
+    # seen. Stopping early (break, close or an error) tells the remaining
+    # producers to give up at their next item.
+    sources = list(sources)
+    results = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(source):
+        try:
+            for item in produce(source):
+                if not put(item):
+                    return
+        except Exception as err:
+            put(_Failed(err))
+        finally:
+            put(_Done)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for source in sources:
+            pool.submit(run, source)
+        try:
+            remaining = len(sources)
+            while remaining:
+                item = results.get()
+                if item is _Done:
+                    remaining -= 1
+                elif isinstance(item, _Failed):
+                    raise item.err
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+
+def submit_bounded(work, batches, done, workers=8, backlog=None):
+    # Runs work(batch) for every batch on a pool, pulling batches from the
+    # iterable only as slots free up, so at most `backlog` (two per worker
+    # by default) are waiting or running and memory stays flat however
+    # many batches there are.
+    #
+    # done(batch, result, err) is called once per batch as it finishes,
+    # with err set instead of result when work raised. Calls are made one
+    # at a time, so done can update shared totals without a lock of its own.
+    in_flight = threading.BoundedSemaphore(backlog or workers * 2)
+    lock = threading.Lock()
+
+    def finished(batch, future):
+        try:
+            try:
+                result, err = future.result(), None
+            except Exception as exc:
+                result, err = None, exc
+            with lock:
+                done(batch, result, err)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch in batches:
+            in_flight.acquire()
+            future = pool.submit(work, batch)
+            future.add_done_callback(partial(finished, batch))
@@ -1,12 +1,26 @@
+import csv
+import hashlib
+import json
 import logging
+import os
 import random
+import sys
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatch
+from functools import partial
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path, PosixPath
 
 import boto3
-from botocore.exceptions import ClientError
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+
+from parallel_iter import iter_parallel, submit_bounded
 
 
 logging.basicConfig(
@@ -15,9 +29,371 @@ logging.basicConfig(
 log = logging.getLogger()
 
 
+MB = 1024 ** 2
+HANDLE_TTL = 300
+
+_handles = {}
+_handles_lock = threading.Lock()
+# Resources are not thread-safe, so each thread keeps its own per region
+_thread_handles = threading.local()
+
+
+def make_transfer_config(part_size=None, max_concurrency=None,
+                         use_threads=True, max_bandwidth=None):
+    params = {'use_threads': use_threads}
+    if part_size:
+        params['multipart_threshold'] = part_size * MB
+        params['multipart_chunksize'] = part_size * MB
+    if max_concurrency:
+        params['max_concurrency'] = max_concurrency
+    if max_bandwidth:
+        params['max_bandwidth'] = int(max_bandwidth * MB)
+    return TransferConfig(**params)
+
+
+class TransferProgress:
+    # Called from the transfer threads with the bytes moved since last call
+    def __init__(self, name, total=None, interval=1.0):
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.transferred = 0
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_report = self._start
+
+    def __call__(self, bytes_amount):
+        with self._lock:
+            self.transferred += bytes_amount
+            now = time.monotonic()
+            done = self.total is not None and self.transferred >= self.total
+            if now - self._last_report >= self.interval or done:
+                self._last_report = now
+                self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.monotonic()) - self._start
+        rate = self.transferred / elapsed / MB if elapsed else 0
+        progress = f'{self.transferred / MB:.1f} MiB'
+        if self.total:
+            progress += (
+                f' / {self.total / MB:.1f} MiB '
+                f'({self.transferred / self.total:.0%})'
+            )
+        log.info(f'{self.name}: {progress} at {rate:.1f} MiB/s')
+
+
+SYNC_MANIFEST = '.s3sync-manifest.json'
+MAX_PARTS = 10000
+MAX_DELETE_KEYS = 1000
+
+
+def file_etag(path, transfer_config=None):
+    # Reproduces the ETag S3 assigns to an upload made with these settings
+    config = transfer_config or TransferConfig()
+    size = os.path.getsize(path)
+    with open(path, 'rb') as fh:
+        if size < config.multipart_threshold:
+            digest = hashlib.md5()
+            for chunk in iter(lambda: fh.read(MB), b''):
+                digest.update(chunk)
+            return digest.hexdigest()
+
+        chunksize = config.multipart_chunksize
+        while -(-size // chunksize) > MAX_PARTS:
+            chunksize *= 2
+        parts = [
+            hashlib.md5(chunk).digest()
+            for chunk in iter(lambda: fh.read(chunksize), b'')
+        ]
+    return f'{hashlib.md5(b"".join(parts)).hexdigest()}-{len(parts)}'
+
+
+def load_sync_manifest(manifest_path, transfer_config):
+    config = transfer_config or TransferConfig()
+    settings = [config.multipart_threshold, config.multipart_chunksize]
+    try:
+        with open(manifest_path) as fh:
+            manifest = json.loads(fh.read())
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    # ETags computed with other part sizes are useless for comparison
+    if manifest.get('settings') != settings:
+        manifest = {'settings': settings, 'files': {}}
+    return manifest
+
+
+def save_sync_manifest(manifest_path, manifest):
+    tmp_path = f'{manifest_path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        fh.write(json.dumps(manifest))
+    os.replace(tmp_path, manifest_path)
+
+
+def scan_local_tree(local_dir, manifest, manifest_path):
+    local_dir = Path(local_dir)
+    cached = manifest['files']
+    files = {}
+    for path in local_dir.rglob('*'):
+        if not path.is_file() or path == Path(manifest_path):
+            continue
+        stat = path.stat()
+        key = path.relative_to(local_dir).as_posix()
+        entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        prev = cached.get(key)
+        if prev and prev['size'] == entry['size'] \
+                and prev['mtime'] == entry['mtime']:
+            entry['etag'] = prev.get('etag')
+        files[key] = entry
+    return files
+
+
+def scan_bucket_prefix(client, bucket_name, prefix=''):
+    objects = {}
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            objects[obj['Key'][len(prefix):]] = {
+                'size': obj['Size'],
+                'etag': obj['ETag'].strip('"'),
+                'mtime': obj['LastModified'],
+            }
+    return objects
+
+
+def diff_trees(local_dir, local, remote, transfer_config, download=False):
+    # Sizes settle most files; only same-size files are hashed, and only
+    # when the manifest has no ETag for their current size and mtime
+    sources, targets = (remote, local) if download else (local, remote)
+    changed = []
+    for key, src in sources.items():
+        dst = targets.get(key)
+        if not dst or dst['size'] != src['size']:
+            changed.append(key)
+            continue
+        entry = local[key]
+        if not entry.get('etag'):
+            entry['etag'] = file_etag(
+                Path(local_dir).joinpath(key), transfer_config)
+        if entry['etag'] != remote[key]['etag']:
+            changed.append(key)
+    removed = [key for key in targets if key not in sources]
+    return changed, removed
+
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def delete_batch(client, bucket_name, targets, retries=5):
+    pending = targets
+    errors = []
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(0.1 * 2 ** attempt, 5) * random.uniform(0.5, 1))
+        try:
+            res = client.delete_objects(Bucket=bucket_name, Delete={
+                'Objects': pending,
+                'Quiet': True
+            })
+        except (ClientError, BotoCoreError) as err:
+            # Connection resets and timeouts are retried like API errors
+            log.warning(f'Delete batch failed, retrying: {err}')
+            errors = []
+            continue
+        errors = res.get('Errors', [])
+        if not errors:
+            return len(targets), []
+        # Only the keys S3 reported as failed go into the next attempt
+        failed = {(e['Key'], e.get('VersionId')) for e in errors}
+        pending = [
+            t for t in pending if (t['Key'], t.get('VersionId')) in failed
+        ]
+    return len(targets) - len(pending), errors or pending
+
+
+def delete_keys(client, bucket_name, targets, workers=8):
+    # Streams 1000-key batches to a bounded pool so memory stays flat
+    # however many objects the listing yields
+    totals = {'deleted': 0, 'failed': 0}
+    start = time.monotonic()
+
+    def done(batch, result, err):
+        if err:
+            log.error(f'Delete batch failed: {err}')
+            result = 0, batch
+        deleted, errors = result
+        totals['deleted'] += deleted
+        totals['failed'] += len(errors)
+        rate = totals['deleted'] / (time.monotonic() - start)
+        log.info(
+            f'Deleted {totals["deleted"]} objects ({rate:.0f}/s), '
+            f'{totals["failed"]} failed'
+        )
+        for error in errors[:10]:
+            log.warning(f'Could not delete {error}')
+
+    submit_bounded(
+        partial(delete_batch, client, bucket_name),
+        iter_batches(targets, MAX_DELETE_KEYS), done, workers,
+    )
+    return totals
+
+
+def iter_object_versions(client, bucket_name, prefix=None):
+    params = {'Bucket': bucket_name}
+    if prefix:
+        params['Prefix'] = prefix
+    paginator = client.get_paginator('list_object_versions')
+    for page in paginator.paginate(**params):
+        for version in page.get('Versions', []) + page.get('DeleteMarkers', []):
+            yield {
+                'Key': version['Key'],
+                'VersionId': version['VersionId']
+            }
+
+
+def sync(bucket_name, local_dir, prefix=None, download=False, delete=False,
+         workers=8, manifest_path=None, transfer_config=None):
+    client = get_s3_client()
+    local_dir = Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+    prefix = prefix or ''
+    if prefix and not prefix.endswith('/'):
+        prefix = f'{prefix}/'
+    manifest_path = Path(manifest_path or local_dir.joinpath(SYNC_MANIFEST))
+    manifest = load_sync_manifest(manifest_path, transfer_config)
+
+    local = scan_local_tree(local_dir, manifest, manifest_path)
+    remote = scan_bucket_prefix(client, bucket_name, prefix)
+    changed, removed = diff_trees(
+        local_dir, local, remote, transfer_config, download)
+    extra = {'Config': transfer_config} if transfer_config else {}
+
+    def transfer(key):
+        file_path = local_dir.joinpath(key)
+        if download:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            client.download_file(
+                bucket_name, f'{prefix}{key}', str(file_path), **extra)
+        else:
+            client.upload_file(
+                str(file_path), bucket_name, f'{prefix}{key}', **extra)
+        return key
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(transfer, key): key for key in changed}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                future.result()
+            except (ClientError, BotoCoreError, S3UploadFailedError,
+                    OSError) as err:
+                # The transfer manager wraps upload errors and raises
+                # transport errors as is; one bad file must not lose the
+                # manifest entries of everything else that went through
+                log.error(f'Sync of {key} failed: {err}')
+                failed.append(key)
+                continue
+            if download:
+                stat = local_dir.joinpath(key).stat()
+                local[key] = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime_ns,
+                    'etag': remote[key]['etag'],
+                }
+            log.info(f'{"Downloaded" if download else "Uploaded"} {key}')
+
+    if delete and removed:
+        if download:
+            for key in removed:
+                local_dir.joinpath(key).unlink()
+                local.pop(key)
+        else:
+            delete_keys(
+                client, bucket_name,
+                ({'Key': f'{prefix}{k}'} for k in removed),
+                workers=workers,
+            )
+        log.info(f'Deleted {len(removed)} files no longer in the source')
+
+    manifest['files'] = local
+    save_sync_manifest(manifest_path, manifest)
+    return {
+        'transferred': len(changed) - len(failed),
+        'failed': len(failed),
+        'deleted': len(removed) if delete else 0,
+        'unchanged': len(remote if download else local) - len(changed),
+    }
+
+
+def cached_handle(key, factory, ttl=HANDLE_TTL, keep=None):
+    with _handles_lock:
+        entry = _handles.get(key)
+    if entry and time.monotonic() - entry[1] < ttl:
+        return entry[0]
+    # Built outside the lock so one slow lookup does not stall every thread;
+    # if another thread got there first its handle wins
+    value = factory()
+    if keep and not keep(value):
+        return value
+    with _handles_lock:
+        entry = _handles.get(key)
+        if entry and time.monotonic() - entry[1] < ttl:
+            return entry[0]
+        _handles[key] = (value, time.monotonic())
+    return value
+
+
+def invalidate_bucket(name):
+    with _handles_lock:
+        _handles.pop(('exists', name), None)
+
+
+def get_s3_client(region=None):
+    # A session per build: boto3's default session is not thread-safe
+    return cached_handle(
+        ('client', region),
+        lambda: boto3.session.Session().client('s3', region_name=region))
+
+
+def get_s3_resource(region=None):
+    # Kept per thread and dropped with it, so pools cannot grow the cache
+    resources = getattr(_thread_handles, 'resources', None)
+    if resources is None:
+        resources = _thread_handles.resources = {}
+    if region not in resources:
+        resources[region] = boto3.session.Session().resource(
+            's3', region_name=region)
+    return resources[region]
+
+
+def bucket_exists(name):
+    # Only hits are cached, so a bucket created after a miss shows up at
+    # once. A 403 is a bucket we may not use, not a missing one
+    def head_bucket():
+        try:
+            get_s3_client().head_bucket(Bucket=name)
+            return True
+        except ClientError as err:
+            code = err.response['Error']['Code']
+            if code not in ('404', 'NoSuchBucket'):
+                raise
+            return False
+    return cached_handle(('exists', name), head_bucket, keep=bool)
+
+
 def create_bucket(name, region=None):
     region = region or 'ap-southeast-1'
-    client = boto3.resource('s3', region_name=region)
+    client = get_s3_resource(region)
     params = {
         'Bucket': name,
         'CreateBucketConfiguration': {
@@ -27,6 +403,7 @@ def create_bucket(name, region=None):
     
     try:
         client.create_bucket(**params)
+        invalidate_bucket(name)
         return True
     except ClientError as err:
         log.error(f'{err} - Params {params}')
@@ -34,7 +411,7 @@ def create_bucket(name, region=None):
 
 
 def list_buckets():
-    s3 = boto3.resource('s3')
+    s3 = get_s3_resource()
     
     count = 0
     for bucket in s3.buckets.all():
@@ -45,11 +422,8 @@ def list_buckets():
 
 
 def get_bucket(name, create=False, region=None):
-    client = boto3.resource('s3')
-    bucket = client.Bucket(name=name)
-    
-    if bucket.creation_date:
-        return bucket
+    if bucket_exists(name):
+        return get_s3_resource().Bucket(name=name)
     else:
         if create:
             create_bucket(name, region=region)
@@ -58,26 +432,115 @@ def get_bucket(name, create=False, region=None):
             log.warning(f'Bucket {name} does not exist.')
 
 
-def create_bucket_object(bucket_name, file_path, key_prefix=None):
+def create_bucket_object(bucket_name, file_path, key_prefix=None,
+                         transfer_config=None, progress=False):
     bucket = get_bucket(bucket_name)
     dest = f'{key_prefix or ""}{file_path}'
     bucket_object = bucket.Object(dest)
-    bucket_object.upload_file(Filename=file_path)
+    params = {'Filename': file_path}
+    if transfer_config:
+        params['Config'] = transfer_config
+    if progress:
+        params['Callback'] = TransferProgress(
+            f'Upload {dest}', Path(file_path).stat().st_size)
+    bucket_object.upload_file(**params)
     return bucket_object
 
 
-def get_bucket_object(bucket_name, object_key, dest=None, version_id=None):
+def get_bucket_object(bucket_name, object_key, dest=None, version_id=None,
+                      transfer_config=None, progress=False):
     bucket = get_bucket(bucket_name)
-    params = {'key': object_key}
-    if version_id:
-        params['VersionId'] = version_id
-    bucket_object = bucket.Object(**params)
+    bucket_object = bucket.Object(object_key)
     dest = Path(f'{dest or ""}')
     file_path = dest.joinpath(PosixPath(object_key).name)
-    bucket_object.download_file(f'{file_path}')
+    params = {'Filename': f'{file_path}'}
+    if version_id:
+        params['ExtraArgs'] = {'VersionId': version_id}
+    if transfer_config:
+        params['Config'] = transfer_config
+    if progress:
+        # content_length is the latest version's, HEAD the one downloaded
+        head = {'Bucket': bucket_name, 'Key': object_key}
+        if version_id:
+            head['VersionId'] = version_id
+        size = get_s3_client().head_object(**head)['ContentLength']
+        params['Callback'] = TransferProgress(f'Download {object_key}', size)
+    bucket_object.download_file(**params)
     return bucket_object, file_path
 
 
+def byte_range(start=None, end=None, tail=None):
+    # Inclusive offsets, or the last `tail` bytes
+    if tail:
+        return f'bytes=-{tail}'
+    if start is None and end is None:
+        return None
+    return f'bytes={start or 0}-{"" if end is None else end}'
+
+
+def open_bucket_object(bucket_name, object_key, start=None, end=None,
+                       tail=None, version_id=None):
+    params = {'Bucket': bucket_name, 'Key': object_key}
+    range_header = byte_range(start, end, tail)
+    if range_header:
+        params['Range'] = range_header
+    if version_id:
+        params['VersionId'] = version_id
+    return get_s3_client().get_object(**params)['Body']
+
+
+def iter_bucket_object(bucket_name, object_key, chunk_size=MB, **params):
+    body = open_bucket_object(bucket_name, object_key, **params)
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+
+def read_into(body, view, chunk_size=MB):
+    # Copies the body into the caller's buffer one chunk at a time. Reading
+    # through StreamingBody keeps its content-length check.
+    pos = 0
+    while pos < len(view):
+        chunk = body.read(min(chunk_size, len(view) - pos))
+        if not chunk:
+            raise IOError(f'Body ended after {pos} of {len(view)} bytes')
+        view[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+    return pos
+
+
+def read_bucket_object_into(bucket_name, object_key, buffer=None,
+                            part_size=8 * MB, workers=8, version_id=None):
+    client = get_s3_client()
+    params = {'Bucket': bucket_name, 'Key': object_key}
+    if version_id:
+        params['VersionId'] = version_id
+    head = client.head_object(**params)
+    size = head['ContentLength']
+
+    if buffer is None:
+        buffer = bytearray(size)
+    view = memoryview(buffer)
+    if len(view) < size:
+        raise ValueError(f'Buffer of {len(view)} bytes, object has {size}')
+
+    def fetch(start):
+        end = min(start + part_size, size) - 1
+        # IfMatch keeps every part from the same object version
+        body = client.get_object(
+            Range=f'bytes={start}-{end}', IfMatch=head['ETag'], **params
+        )['Body']
+        try:
+            return read_into(body, view[start:end + 1])
+        finally:
+            body.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fetch, range(0, size, part_size)))
+    return view[:size]
+
+
 def enable_bucket_versioning(bucket_name):
     bucket = get_bucket(bucket_name)
     versioned = bucket.Versioning()
@@ -92,55 +555,206 @@ def list_bucket_objects(bucket_name, prefix=None):
     return bucket.objects.all()
 
 
+LISTING_FIELDS = ['key', 'size', 'etag', 'mtime']
+
+
+def iter_bucket_objects(bucket_name, prefix=None, delimiter=None,
+                        max_items=None, page_size=None):
+    params = {
+        'Bucket': bucket_name,
+        'Prefix': prefix or '',
+        'PaginationConfig': {},
+    }
+    if delimiter:
+        params['Delimiter'] = delimiter
+    if max_items:
+        params['PaginationConfig']['MaxItems'] = max_items
+    if page_size:
+        params['PaginationConfig']['PageSize'] = page_size
+
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    for page in paginator.paginate(**params):
+        for common in page.get('CommonPrefixes', []):
+            yield {
+                'key': common['Prefix'],
+                'size': None,
+                'etag': None,
+                'mtime': None,
+            }
+        for obj in page.get('Contents', []):
+            yield {
+                'key': obj['Key'],
+                'size': obj['Size'],
+                'etag': obj['ETag'].strip('"'),
+                'mtime': obj['LastModified'].isoformat(),
+            }
+
+
+def iter_bucket_objects_parallel(bucket_name, prefix=None, workers=8,
+                                 page_size=None, buffer_size=10000):
+    # One delimited listing finds the sub-prefixes, which are then listed
+    # concurrently; results stream through a bounded queue
+    prefixes = []
+    for entry in iter_bucket_objects(
+            bucket_name, prefix, delimiter='/', page_size=page_size):
+        if entry['size'] is None:
+            prefixes.append(entry['key'])
+        else:
+            yield entry
+
+    def list_prefix(sub_prefix):
+        return iter_bucket_objects(bucket_name, sub_prefix, page_size=page_size)
+
+    yield from iter_parallel(list_prefix, prefixes, workers, buffer_size)
+
+
+def write_listing(entries, fmt='text', out=None):
+    out = out or sys.stdout
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=LISTING_FIELDS)
+        writer.writeheader()
+    for entry in entries:
+        if fmt == 'jsonl':
+            out.write(json.dumps(entry) + '\n')
+        elif fmt == 'csv':
+            writer.writerow(entry)
+        else:
+            size = 'PRE' if entry['size'] is None else entry['size']
+            out.write(f'{entry["mtime"] or "":<32} {size:>12} {entry["key"]}\n')
+        count += 1
+    return count
+
+
+def list_objects(bucket_name, prefix=None, delimiter=None, max_items=None,
+                 page_size=None, fmt='text', parallel=0):
+    if parallel and not delimiter:
+        entries = iter_bucket_objects_parallel(
+            bucket_name, prefix, workers=parallel, page_size=page_size)
+        if max_items:
+            entries = (e for _, e in zip(range(max_items), entries))
+    else:
+        entries = iter_bucket_objects(
+            bucket_name, prefix, delimiter, max_items, page_size)
+    return write_listing(entries, fmt)
+
+
 def delete_bucket_object(bucket_name, object_key):
     bucket = get_bucket(bucket_name)
     bucket.Object(object_key).delete()
 
 
-def delete_bucket_objects(bucket_name, key_prefix):
-    bucket = get_bucket(bucket_name)
-    objects = bucket.object_versions
-    if key_prefix:
-        objects = objects.filter(Prefix=key_prefix)
-    else:
-        objects = objects.iterator()
-        
-    targets = []
-    for o in objects:
-        targets.append({
-            'Key': o.object_key,
-            'VersionId': o.version_id
-        })
-    
-    bucket.delete_objects(Delete={
-        'Objects': targets,
-        'Quiet': True
-    })
-    
-    return len(targets)
+def delete_bucket_objects(bucket_name, key_prefix=None, workers=8):
+    client = get_s3_client()
+    targets = iter_object_versions(client, bucket_name, key_prefix)
+    totals = delete_keys(client, bucket_name, targets, workers=workers)
+    log.info(
+        f'Deleted {totals["deleted"]} object versions from {bucket_name}, '
+        f'{totals["failed"]} failed'
+    )
+    return totals['deleted']
+
+
+def teardown_bucket(client, name, empty=False, workers=4):
+    if empty:
+        delete_keys(
+            client, name, iter_object_versions(client, name), workers=workers)
+    client.delete_bucket(Bucket=name)
+    invalidate_bucket(name)
+    return name
+
+
+def wait_bucket_deleted(client, name):
+    client.get_waiter('bucket_not_exists').wait(
+        Bucket=name,
+        WaiterConfig={'Delay': 5, 'MaxAttempts': 20}
+    )
+    return name
 
 
-def delete_buckets(name=None):
+def delete_buckets(name=None, pattern=None, empty=False, workers=8):
     count = 0
     if name:
         bucket = get_bucket(name)
         if bucket:
+            if empty:
+                delete_bucket_objects(name)
             bucket.delete()
             bucket.wait_until_not_exists()
+            invalidate_bucket(name)
             count += 1
-    else:
-        count = 0
-        client = boto3.resource('s3')
-        for bucket in client.buckets.iterator():
+        return count
+
+    client = get_s3_client()
+    names = [
+        b['Name'] for b in client.list_buckets()['Buckets']
+        if not pattern or fnmatch(b['Name'], pattern)
+    ]
+    log.info(f'Tearing down {len(names)} buckets')
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        deletes = {
+            pool.submit(teardown_bucket, client, n, empty): n for n in names
+        }
+        # Waiters are queued as soon as each delete returns instead of
+        # holding up the next bucket
+        waits = {}
+        for future in as_completed(deletes):
+            bucket_name = deletes[future]
             try:
-                bucket.delete()
-                bucket.wait_until_not_exists()
+                future.result()
+            except (ClientError, BotoCoreError) as err:
+                log.warning(f'Bucket {bucket_name}: {err}')
+                continue
+            waits[pool.submit(wait_bucket_deleted, client, bucket_name)] = \
+                bucket_name
+
+        for future in as_completed(waits):
+            bucket_name = waits[future]
+            try:
+                future.result()
                 count += 1
-            except ClientError as err:
-                log.warning(f'Bucket {bucket.name}: {err}')
+            except BotoCoreError as err:
+                log.warning(f'Bucket {bucket_name} not confirmed deleted: {err}')
     return count
 
 
+def add_transfer_arguments(sp):
+    sp.add_argument(
+        '--part-size',
+        type=int,
+        help='Multipart threshold and part size in MiB. Defaults to 8.'
+    )
+    sp.add_argument(
+        '--max-concurrency',
+        type=int,
+        help='Number of parts transferred at once. Defaults to 10.'
+    )
+    sp.add_argument(
+        '--use-threads',
+        type=lambda s: s.lower() in ('1', 'true', 'yes', 'on'),
+        default=True,
+        help='Transfer parts in threads (true/false). Defaults to true.'
+    )
+    sp.add_argument(
+        '--max-bandwidth',
+        type=float,
+        help='Bandwidth cap in MiB/s.'
+    )
+    sp.add_argument(
+        '--progress',
+        action='store_true',
+        help='Log transferred bytes and throughput.'
+    )
+
+
+def transfer_config_from_args(pargs):
+    return make_transfer_config(
+        part_size=pargs.part_size,
+        max_concurrency=pargs.max_concurrency,
+        use_threads=pargs.use_threads,
+        max_bandwidth=pargs.max_bandwidth,
+    )
+
     
 if __name__ == '__main__':
     import argparse
@@ -218,6 +832,8 @@ if __name__ == '__main__':
         '--key-prefix', '-K'
     )
     
+    add_transfer_arguments(sp_action_bucket_object_create)
+    
     sp_action_bucket_object_create.set_defaults(func=create_bucket_object)
     
     # Get Object from Bucket
@@ -242,6 +858,8 @@ if __name__ == '__main__':
         '--version-id', '-V'
     )
     
+    add_transfer_arguments(sp_action_bucket_object_get)
+    
     sp_action_bucket_object_get.set_defaults(func=get_bucket_object)
     
     sp_action_bucket_object_list = subparsers.add_parser(
@@ -259,6 +877,89 @@ if __name__ == '__main__':
     
     sp_action_bucket_object_list.set_defaults(func=list_bucket_objects)
     
+    # Stream an object to stdout
+    sp_action_bucket_object_stream = subparsers.add_parser(
+        'stream_bucket_object',
+        help='Write an object, or a byte range of it, to stdout.'
+    )
+    
+    sp_action_bucket_object_stream.add_argument(
+        'bucket_name'
+    )
+    
+    sp_action_bucket_object_stream.add_argument(
+        'object_key'
+    )
+    
+    sp_action_bucket_object_stream.add_argument(
+        '--start', '-s',
+        type=int,
+        help='First byte to read.'
+    )
+    
+    sp_action_bucket_object_stream.add_argument(
+        '--end', '-e',
+        type=int,
+        help='Last byte to read (inclusive).'
+    )
+    
+    sp_action_bucket_object_stream.add_argument(
+        '--tail', '-t',
+        type=int,
+        help='Read only the last N bytes.'
+    )
+    
+    sp_action_bucket_object_stream.add_argument(
+        '--version-id', '-V'
+    )
+    
+    sp_action_bucket_object_stream.set_defaults(func=iter_bucket_object)
+    
+    # Stream a listing
+    sp_action_objects_list = subparsers.add_parser(
+        'list_objects',
+        help='Stream a bucket listing page by page.'
+    )
+    
+    sp_action_objects_list.add_argument(
+        'bucket_name'
+    )
+    
+    sp_action_objects_list.add_argument(
+        '--prefix', '-P'
+    )
+    
+    sp_action_objects_list.add_argument(
+        '--delimiter', '-d',
+        help='Group keys by this delimiter and list only the prefixes.'
+    )
+    
+    sp_action_objects_list.add_argument(
+        '--max-items', '-M',
+        type=int
+    )
+    
+    sp_action_objects_list.add_argument(
+        '--page-size', '-S',
+        type=int,
+        help='Keys requested per call. S3 caps this at 1000.'
+    )
+    
+    sp_action_objects_list.add_argument(
+        '--format', '-F',
+        choices=['text', 'jsonl', 'csv'],
+        default='text'
+    )
+    
+    sp_action_objects_list.add_argument(
+        '--parallel', '-W',
+        type=int,
+        default=0,
+        help='List the sub-prefixes of --prefix with this many workers.'
+    )
+    
+    sp_action_objects_list.set_defaults(func=list_objects)
+    
     # Enable versioning
     sp_action_bucket_enable_versioning = subparsers.add_parser(
         'enable_bucket_versioning',
@@ -300,8 +1001,62 @@ if __name__ == '__main__':
         '--key-prefix', '-K'
     )
     
+    sp_action_bucket_objects_delete.add_argument(
+        '--workers', '-W',
+        type=int,
+        default=8,
+        help='Delete requests sent at once. Defaults to 8.'
+    )
+    
     sp_action_bucket_objects_delete.set_defaults(func=delete_bucket_objects)
     
+    # Sync a directory with a bucket prefix
+    sp_action_sync = subparsers.add_parser(
+        'sync',
+        help='Upload (or download) only the files that changed.'
+    )
+    
+    sp_action_sync.add_argument(
+        'bucket_name'
+    )
+    
+    sp_action_sync.add_argument(
+        'local_dir'
+    )
+    
+    sp_action_sync.add_argument(
+        '--prefix', '-P',
+        help='Key prefix in the bucket to sync with.'
+    )
+    
+    sp_action_sync.add_argument(
+        '--download', '-D',
+        action='store_true',
+        help='Sync from the bucket to the local directory.'
+    )
+    
+    sp_action_sync.add_argument(
+        '--delete',
+        action='store_true',
+        help='Remove files that no longer exist in the source.'
+    )
+    
+    sp_action_sync.add_argument(
+        '--workers', '-W',
+        type=int,
+        default=8,
+        help='Files transferred at once. Defaults to 8.'
+    )
+    
+    sp_action_sync.add_argument(
+        '--manifest', '-M',
+        help=f'Local ETag cache. Defaults to <local_dir>/{SYNC_MANIFEST}'
+    )
+    
+    add_transfer_arguments(sp_action_sync)
+    
+    sp_action_sync.set_defaults(func=sync)
+    
     sp_action_delete_buckets = subparsers.add_parser(
         'delete_buckets',
         help='delete buckets in an account'
@@ -311,6 +1066,24 @@ if __name__ == '__main__':
         '--bucket-name'
     )
     
+    sp_action_delete_buckets.add_argument(
+        '--pattern', '-P',
+        help='Only delete buckets whose name matches this glob.'
+    )
+    
+    sp_action_delete_buckets.add_argument(
+        '--empty', '-E',
+        action='store_true',
+        help='Delete every object version first so non-empty buckets go too.'
+    )
+    
+    sp_action_delete_buckets.add_argument(
+        '--workers', '-W',
+        type=int,
+        default=8,
+        help='Buckets torn down at once. Defaults to 8.'
+    )
+    
     sp_action_delete_buckets.set_defaults(func=delete_buckets)
     
     
@@ -323,28 +1096,83 @@ if __name__ == '__main__':
     elif action == 'get_bucket':
         print(pargs.func(pargs.bucket_name, pargs.create, pargs.region))
     elif action == 'create_bucket_object':
-        print(pargs.func(pargs.bucket_name, pargs.file_path, pargs.key_prefix))
+        print(
+            pargs.func(
+                pargs.bucket_name,
+                pargs.file_path,
+                pargs.key_prefix,
+                transfer_config_from_args(pargs),
+                pargs.progress
+            )
+        )
     elif action == 'get_bucket_object':
         print(
             pargs.func(
                 pargs.bucket_name, 
                 pargs.object_key,
                 pargs.destination, 
-                pargs.version_id
+                pargs.version_id,
+                transfer_config_from_args(pargs),
+                pargs.progress
             )
         )
     elif action == 'list_bucket_objects':
         objs = pargs.func(pargs.bucket_name, pargs.prefix)
         for o in objs:
             print(o)
+    elif action == 'iter_bucket_object':
+        chunks = pargs.func(
+            pargs.bucket_name,
+            pargs.object_key,
+            start=pargs.start,
+            end=pargs.end,
+            tail=pargs.tail,
+            version_id=pargs.version_id
+        )
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.flush()
+        sys.exit(0)
+    elif action == 'list_objects':
+        count = pargs.func(
+            pargs.bucket_name,
+            pargs.prefix,
+            pargs.delimiter,
+            pargs.max_items,
+            pargs.page_size,
+            pargs.format,
+            pargs.parallel
+        )
+        log.info(f'Listed {count} entries')
+        sys.exit(0)
     elif action == 'enable_bucket_versioning':
         print((pargs.func(pargs.bucket_name)))
     elif action == 'delete_bucket_object':
         print(pargs.func(pargs.bucket_name, pargs.object_key))
     elif action == 'delete_bucket_objects':
-        print(pargs.func(pargs.bucket_name, pargs.key_prefix))
+        print(pargs.func(pargs.bucket_name, pargs.key_prefix, pargs.workers))
     elif action == 'delete_buckets':
-        print(pargs.func(pargs.bucket_name))
+        print(
+            pargs.func(
+                pargs.bucket_name,
+                pargs.pattern,
+                pargs.empty,
+                pargs.workers
+            )
+        )
+    elif action == 'sync':
+        print(
+            pargs.func(
+                pargs.bucket_name,
+                pargs.local_dir,
+                pargs.prefix,
+                pargs.download,
+                pargs.delete,
+                pargs.workers,
+                pargs.manifest,
+                transfer_config_from_args(pargs)
+            )
+        )
     else:
         print('Missing or Invalid Command')
         
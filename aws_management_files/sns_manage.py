@@ -1,8 +1,14 @@
 import sys
+import json
+import random
 import logging
+import time
+from functools import lru_cache, partial
 
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
+
+from parallel_iter import submit_bounded
 
 
 logging.basicConfig(
@@ -11,28 +17,61 @@ logging.basicConfig(
 log = logging.getLogger()
 
 
+PUBLISH_BATCH_SIZE = 10
+# PublishBatch also caps the combined size of a batch's messages
+PUBLISH_BATCH_BYTES = 256 * 1024
+RETRY_ERRORS = ('Throttling', 'ThrottledException', 'InternalError')
+# Optional PublishBatch entry fields accepted from JSON Lines input
+ENTRY_FIELDS = [
+    'Subject', 'MessageStructure', 'MessageAttributes',
+    'MessageDeduplicationId', 'MessageGroupId',
+]
+
+
+# Clients are thread-safe, so every command and worker shares one
+@lru_cache(maxsize=None)
+def get_sns_client():
+    return boto3.client('sns')
+
+
 def create_sns_topic(topic_name):
-    sns = boto3.client('sns')
+    sns = get_sns_client()
     sns.create_topic(Name=topic_name)
     return True
 
 
+def iter_pages(operation, next_token=None, **params):
+    paginator = get_sns_client().get_paginator(operation)
+    if next_token:
+        params['PaginationConfig'] = {'StartingToken': next_token}
+    return paginator.paginate(**params)
+
+
+def iter_sns_topics(next_token=None):
+    for page in iter_pages('list_topics', next_token):
+        yield from page.get('Topics', [])
+
+
 def list_sns_topic(next_token=None):
-    sns = boto3.client('sns')
-    params = {'NextToken': next_token} if next_token else {}
-    topics = sns.list_topics(**params)
-    return topics.get('Topics', {}), topics.get('NextToken', None)
+    return list(iter_sns_topics(next_token))
+
+
+def iter_sns_subscriptions(topic_arn=None, next_token=None):
+    if topic_arn:
+        pages = iter_pages(
+            'list_subscriptions_by_topic', next_token, TopicArn=topic_arn)
+    else:
+        pages = iter_pages('list_subscriptions', next_token)
+    for page in pages:
+        yield from page.get('Subscriptions', [])
 
 
-def list_sns_subscriptions(next_token=None):
-    sns = boto3.client('sns')
-    params = {'NextToken': next_token} if next_token else {}
-    subscriptions = sns.list_subscriptions(**params)
-    return subscriptions.get('Subscriptions', []), subscriptions.get('NextToken', None)
+def list_sns_subscriptions(next_token=None, topic_arn=None):
+    return list(iter_sns_subscriptions(topic_arn, next_token))
 
 
 def subscribe_sns_topic(topic_arn, mobile_number):
-    sns = boto3.client('sns')
+    sns = get_sns_client()
     params = {
         'TopicArn': topic_arn,
         'Protocol': 'sms',
@@ -44,7 +83,7 @@ def subscribe_sns_topic(topic_arn, mobile_number):
 
 
 def send_sns_message(topic_arn, message):
-    sns = boto3.client('sns')
+    sns = get_sns_client()
     params = {
         'TopicArn': topic_arn,
         'Message': message,
@@ -54,8 +93,155 @@ def send_sns_message(topic_arn, message):
     return True
 
 
+def read_messages(source='-', fmt='text'):
+    # Text input is one message per line, JSON Lines input is one object
+    # per line with a Message and any of ENTRY_FIELDS
+    fh = sys.stdin if source == '-' else open(source)
+    try:
+        for line in fh:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if fmt == 'jsonl':
+                entry = json.loads(line)
+                yield {
+                    k: v for k, v in entry.items()
+                    if k == 'Message' or k in ENTRY_FIELDS
+                }
+            else:
+                yield {'Message': line}
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def entry_size(entry):
+    # Bytes SNS counts towards the payload limit: the message, subject and
+    # message attribute names, types and values
+    size = len(entry.get('Message', '').encode('utf-8'))
+    size += len(entry.get('Subject', '').encode('utf-8'))
+    for name, attr in entry.get('MessageAttributes', {}).items():
+        size += len(name.encode('utf-8'))
+        size += len(attr.get('DataType', '').encode('utf-8'))
+        if 'BinaryValue' in attr:
+            size += len(attr['BinaryValue'])
+        else:
+            size += len(attr.get('StringValue', '').encode('utf-8'))
+    return size
+
+
+def iter_batches(items, size, max_bytes=None):
+    # A batch closes at `size` items or before it would pass `max_bytes`;
+    # an item over the limit on its own still goes alone, for SNS to reject
+    batch = []
+    batch_bytes = 0
+    for item in items:
+        item_bytes = entry_size(item) if max_bytes else 0
+        if batch and max_bytes and batch_bytes + item_bytes > max_bytes:
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(item)
+        batch_bytes += item_bytes
+        if len(batch) == size:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def publish_batch(client, topic_arn, entries, retries=5):
+    # Entries carry their Id; returns the number published and the
+    # failures SNS reported as the sender's fault or that kept failing
+    published = 0
+    failed = []
+    pending = entries
+    last_code = 'RetriesExhausted'
+    for attempt in range(retries + 1):
+        if attempt:
+            # Full jitter
+            time.sleep(random.uniform(0, min(5, 0.1 * 2 ** attempt)))
+        try:
+            res = client.publish_batch(
+                TopicArn=topic_arn, PublishBatchRequestEntries=pending)
+        except ClientError as err:
+            code = err.response['Error']['Code']
+            if code in RETRY_ERRORS:
+                continue
+            failed.extend(
+                {'Id': e['Id'], 'Code': code, 'Entry': e} for e in pending)
+            return published, failed
+        except BotoCoreError as err:
+            # Connection errors and timeouts are retried like throttling;
+            # only what is still pending can fail, earlier attempts stand
+            log.warning(f'Publish batch failed, retrying: {err}')
+            last_code = type(err).__name__
+            continue
+        by_id = {e['Id']: e for e in pending}
+        for ok in res.get('Successful', []):
+            if by_id.pop(ok['Id'], None) is not None:
+                published += 1
+        pending = []
+        for fail in res.get('Failed', []):
+            entry = by_id.pop(fail['Id'], None)
+            if entry is None:
+                continue
+            if fail.get('SenderFault'):
+                failed.append(dict(fail, Entry=entry))
+            else:
+                pending.append(entry)
+        # Every entry should be reported one way or the other
+        failed.extend(
+            {'Id': i, 'Code': 'NoResult', 'Entry': e}
+            for i, e in by_id.items()
+        )
+        if not pending:
+            return published, failed
+    failed.extend(
+        {'Id': e['Id'], 'Code': last_code, 'Entry': e}
+        for e in pending
+    )
+    return published, failed
+
+
+def publish_messages(topic_arn, messages, workers=8):
+    client = get_sns_client()
+    totals = {'published': 0, 'failed': []}
+    start = time.monotonic()
+
+    def done(batch, result, err):
+        if err:
+            log.error(f'Publish batch failed: {err}')
+            # Nothing is known to have been published, so report it all
+            result = 0, [
+                {'Id': e['Id'], 'Code': 'Exception', 'Message': str(err),
+                 'Entry': e}
+                for e in batch
+            ]
+        published, failed = result
+        totals['published'] += published
+        totals['failed'].extend(failed)
+
+    entries = (
+        dict(message, Id=str(i)) for i, message in enumerate(messages)
+    )
+    submit_bounded(
+        partial(publish_batch, client, topic_arn),
+        iter_batches(entries, PUBLISH_BATCH_SIZE, PUBLISH_BATCH_BYTES),
+        done, workers,
+    )
+    elapsed = time.monotonic() - start
+    log.info(
+        f'Published {totals["published"]} messages to {topic_arn} in '
+        f'{elapsed:.1f}s ({totals["published"] / (elapsed or 1):.0f}/s), '
+        f'{len(totals["failed"])} failed'
+    )
+    return totals
+
+
 def unsubscribe_sns_topic(subscription_arn):
-    sns = boto3.client('sns')
+    sns = get_sns_client()
     params = {
         'SubscriptionArn': subscription_arn,
     }
@@ -65,7 +251,7 @@ def unsubscribe_sns_topic(subscription_arn):
 
 
 def delete_sns_topic(topic_arn):
-    sns = boto3.client('sns')
+    sns = get_sns_client()
     sns.delete_topic(TopicArn=topic_arn)
     return True
 
@@ -105,6 +291,11 @@ if __name__ == '__main__':
         '--next-token', '-N'
     )
     
+    sp_list_sns_subscriptions.add_argument(
+        '--topic-arn', '-T',
+        help='Only list subscriptions to this topic.'
+    )
+    
     sp_list_sns_subscriptions.set_defaults(func=list_sns_subscriptions)
     
     sp_subscribe_sns_topic = subparser.add_parser(
@@ -135,6 +326,38 @@ if __name__ == '__main__':
     
     sp_send_sns_message.set_defaults(func=send_sns_message)
     
+    sp_publish_batch = subparser.add_parser(
+        'publish-batch',
+        help='Publish every message in a file or stdin, 10 per request.'
+    )
+    
+    sp_publish_batch.add_argument(
+        'topic_arn'
+    )
+    
+    sp_publish_batch.add_argument(
+        'source',
+        nargs='?',
+        default='-',
+        help='Message file, one per line. Reads stdin when omitted.'
+    )
+    
+    sp_publish_batch.add_argument(
+        '--format', '-f',
+        choices=['text', 'jsonl'],
+        default='text',
+        help='text: one message per line, jsonl: one entry object per line.'
+    )
+    
+    sp_publish_batch.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=8,
+        help='Concurrent PublishBatch requests.'
+    )
+    
+    sp_publish_batch.set_defaults(func=publish_messages)
+    
     sp_unsubscribe_sns_topic = subparser.add_parser(
         'unsubscribe-sns-topic'
     )
@@ -162,10 +385,14 @@ if __name__ == '__main__':
         print(pargs.func(pargs.topic_name))
         sys.exit(0)
     elif action == 'list_sns_topic':
-        print(pargs.func(pargs.next_token))
+        for topic in iter_sns_topics(pargs.next_token):
+            print(topic['TopicArn'])
         sys.exit(0)
     elif action == 'list_sns_subscriptions':
-        print(pargs.func(pargs.next_token))
+        subscriptions = iter_sns_subscriptions(
+            pargs.topic_arn, pargs.next_token)
+        for subscription in subscriptions:
+            print(json.dumps(subscription))
         sys.exit(0)
     elif action == 'subscribe_sns_topic':
         pargs.func(pargs.topic_arn, pargs.mobile_number)
@@ -173,6 +400,16 @@ if __name__ == '__main__':
     elif action == 'send_sns_message':
         pargs.func(pargs.topic_arn, pargs.message)
         sys.exit(0)
+    elif action == 'publish_messages':
+        messages = read_messages(pargs.source, pargs.format)
+        totals = pargs.func(pargs.topic_arn, messages, pargs.workers)
+        for fail in totals['failed']:
+            print(json.dumps(fail), file=sys.stderr)
+        print(json.dumps({
+            'published': totals['published'],
+            'failed': len(totals['failed']),
+        }))
+        sys.exit(1 if totals['failed'] else 0)
     elif action == 'unsubscribe_sns_topic':
         pargs.func(pargs.subscription_arn)
         sys.exit(0)
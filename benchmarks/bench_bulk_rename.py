@@ -0,0 +1,17 @@
+import pytest
+
+import d2e2_bulk_rename_with_logger as bulk_rename
+
+
+@pytest.fixture(autouse=True)
+def offline_logger():
+    bulk_rename.logger.removeHandler(bulk_rename.client)
+    yield
+    bulk_rename.logger.addHandler(bulk_rename.client)
+
+
+@pytest.mark.benchmark(group='rename')
+def bench_plan_renames(benchmark, rename_dir):
+    renames = benchmark(
+        bulk_rename.plan_renames, rename_dir, r'^IMG_\d+\.jpg$', 'photo')
+    assert len(renames) == 667
@@ -0,0 +1,40 @@
+import pytest
+
+import d2e1_csv_parser_with_logger as csv_parser
+
+
+@pytest.fixture(autouse=True)
+def offline_logger():
+    # Keep the pipeline from posting every log line to the live Logginator
+    csv_parser.log.removeHandler(csv_parser.client)
+    yield
+    csv_parser.log.addHandler(csv_parser.client)
+
+
+@pytest.mark.benchmark(group='csv')
+def bench_get_rows(benchmark, products_csv):
+    rows = benchmark(csv_parser.get_rows, products_csv)
+    assert len(rows) == 5000
+
+
+@pytest.mark.benchmark(group='csv')
+def bench_remove_items_without_categories(benchmark, products_csv):
+    rows = csv_parser.get_rows(products_csv)
+    benchmark.pedantic(
+        csv_parser.remove_items_without_categories,
+        setup=lambda: ((list(rows),), {}),
+        rounds=20,
+    )
+
+
+@pytest.mark.benchmark(group='csv')
+def bench_pipeline(benchmark, products_csv, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def pipeline():
+        items = csv_parser.get_rows(products_csv)
+        items = csv_parser.remove_items_without_categories(items)
+        csv_parser.write_items(items)
+
+    benchmark(pipeline)
+    assert tmp_path.joinpath('new_file.csv').exists()
@@ -0,0 +1,23 @@
+import pytest
+
+import dynamo_manage
+from conftest import load_tabledef
+
+
+@pytest.fixture
+def products_table(aws):
+    conf = load_tabledef('products_tabledef.json')
+    return dynamo_manage.create_dynamo_table(**conf)
+
+
+@pytest.mark.benchmark(group='dynamodb')
+def bench_create_dynamo_items(benchmark, products_table, product_items):
+    benchmark.pedantic(
+        dynamo_manage.create_dynamo_items,
+        args=('products', product_items),
+        # moto never throttles, so pacing would only add overhead
+        kwargs={'target_utilisation': 0},
+        rounds=3,
+    )
+    count = products_table.scan(Select='COUNT')['Count']
+    assert count == len(product_items)
@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.fixture
+def app(aws):
+    from logginator_harness import setup_aws_stubs, load_handler
+    mock = setup_aws_stubs(aws)
+    app = load_handler()
+    app.get_sns_client.cache_clear()
+    app.get_logs_table.cache_clear()
+    app.get_rollups_table.cache_clear()
+    yield app
+    mock.stop()
+
+
+@pytest.mark.benchmark(group='logginator')
+def bench_process_log_events(benchmark, app, log_events, monkeypatch):
+    monkeypatch.delenv('DEVOPS_EMAIL', raising=False)
+    events = iter(log_events * 1000)
+
+    def process():
+        return app.process_log_events(dict(next(events)))
+
+    res = benchmark(process)
+    assert res['statusCode'] == 200
@@ -0,0 +1,22 @@
+import logging
+
+import pytest
+
+from logginator_client import LogginatorClient
+
+
+@pytest.fixture
+def client_logger(stub_endpoint):
+    logger = logging.getLogger('bench.logginator_client')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    client = LogginatorClient()
+    client.set_url(stub_endpoint)
+    logger.addHandler(client)
+    yield logger
+    logger.removeHandler(client)
+
+
+@pytest.mark.benchmark(group='logginator')
+def bench_emit(benchmark, client_logger):
+    benchmark(client_logger.info, 'Benchmark message')
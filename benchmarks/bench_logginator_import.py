@@ -0,0 +1,12 @@
+import pytest
+
+from logginator_importtime import check_budget, DEFAULT_BUDGET_MS
+
+
+@pytest.mark.benchmark(group='logginator')
+def bench_cold_import(benchmark):
+    result = benchmark.pedantic(
+        check_budget, kwargs={'runs': 1}, rounds=3)
+    benchmark.extra_info['budget_ms'] = DEFAULT_BUDGET_MS
+    benchmark.extra_info['total_ms'] = result['total_ms']
+    assert not result['failures'], result['failures']
@@ -0,0 +1,30 @@
+import pytest
+
+import s3_manage
+
+BUCKET = 'jed-benchmark-bucket'
+
+
+@pytest.fixture
+def bucket(aws):
+    s3_manage.create_bucket(BUCKET, region=aws)
+    return BUCKET
+
+
+@pytest.mark.benchmark(group='s3')
+def bench_create_bucket_object(benchmark, bucket, payload_file):
+    benchmark.pedantic(
+        s3_manage.create_bucket_object,
+        args=(bucket, str(payload_file)),
+        rounds=5,
+    )
+
+
+@pytest.mark.benchmark(group='s3')
+def bench_get_bucket_object(benchmark, bucket, payload_file, tmp_path):
+    obj = s3_manage.create_bucket_object(bucket, str(payload_file))
+    benchmark.pedantic(
+        s3_manage.get_bucket_object,
+        args=(bucket, obj.key, str(tmp_path)),
+        rounds=5,
+    )
@@ -0,0 +1,125 @@
+import sys
+import csv
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+for path in [
+    REPO_DIR,
+    REPO_DIR.joinpath('capstone'),
+    REPO_DIR.joinpath('capstone', 'logginator'),
+    REPO_DIR.joinpath('aws_management_files'),
+    REPO_DIR.joinpath('benchmarks'),
+]:
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from aws_fixtures import aws  # noqa: E402,F401
+
+# Synthetic datasets are generated from fixed seeds so runs are comparable
+SEED = 20200415
+SAMPLE_CSV = REPO_DIR.joinpath('exercises', 'sample-files', 'sample_products.csv')
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+
+@pytest.fixture(scope='session')
+def stub_endpoint():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _OkHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/logs'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='session')
+def log_events():
+    rng = random.Random(SEED)
+    levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+    return [
+        {
+            'log_level': rng.choices(levels, [20, 60, 12, 7, 1])[0],
+            'message': f'event {i}',
+            'details': f'Line {rng.randint(1, 500)}: event {i}',
+            'source_application': f'app-{rng.randint(1, 8)}',
+        }
+        for i in range(200)
+    ]
+
+
+@pytest.fixture(scope='session')
+def products_csv(tmp_path_factory):
+    # The sample catalogue repeated to 5000 rows, a fifth without categories
+    rng = random.Random(SEED)
+    with open(SAMPLE_CSV, newline='') as fh:
+        reader = csv.DictReader(fh)
+        fields = reader.fieldnames
+        sample = list(reader)
+
+    path = tmp_path_factory.mktemp('csv').joinpath('products.csv')
+    with open(path, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=fields, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        for i in range(5000):
+            row = dict(sample[i % len(sample)])
+            row['ID'] = str(i)
+            row['SKU'] = f'sku-{i:05d}'
+            if rng.random() < 0.2:
+                row['Categories'] = ''
+            writer.writerow(row)
+    return path
+
+
+@pytest.fixture(scope='session')
+def rename_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('rename')
+    for i in range(2000):
+        ext = ['.jpg', '.png', '.txt'][i % 3]
+        path.joinpath(f'IMG_{i:05d}{ext}').touch()
+    return path
+
+
+@pytest.fixture(scope='session')
+def payload_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp('s3').joinpath('payload.bin')
+    path.write_bytes(random.Random(SEED).randbytes(16 * 2**20))
+    return path
+
+
+@pytest.fixture(scope='session')
+def product_items():
+    rng = random.Random(SEED)
+    return [
+        {
+            'category': f'category-{i % 20}',
+            'sku': f'sku-{i:06d}',
+            'name': f'Product {i}',
+            'stock': rng.randint(0, 500),
+        }
+        for i in range(2000)
+    ]
+
+
+def load_tabledef(name):
+    with open(REPO_DIR.joinpath('aws_management_files', name)) as fh:
+        return json.loads(fh.read())
@@ -0,0 +1,142 @@
+import os
+import sys
+import subprocess as sp
+import tempfile
+import logging
+from pathlib import Path
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s %(module)s %(lineno)d - %(message)s')
+log = logging.getLogger()
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+LOGGINATOR_DIR = REPO_DIR.joinpath('capstone', 'logginator')
+DEFAULT_BUDGET_MS = 400
+# Modules that must stay off the cold start path
+LAZY_MODULES = [
+    'requests',
+]
+
+
+def parse_importtime(stderr):
+    # Lines look like: "import time:   self [us] | cumulative | package"
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(fields[0]),
+            'cumulative_us': int(fields[1]),
+        })
+    return entries
+
+
+def measure_importtime(module='app', module_dir=LOGGINATOR_DIR,
+                       compile_sources=False):
+    env = dict(os.environ)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if compile_sources:
+            # An empty pycache prefix forces every module to be compiled
+            env['PYTHONPYCACHEPREFIX'] = cache_dir
+        res = sp.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=module_dir, env=env,
+            stdout=sp.PIPE, stderr=sp.PIPE, universal_newlines=True,
+        )
+    if res.returncode != 0:
+        raise RuntimeError(f'Import of {module} failed:\n{res.stderr}')
+
+    entries = parse_importtime(res.stderr)
+    target = [e for e in entries if e['module'] == module]
+    if not target:
+        raise RuntimeError(f'No importtime entry for {module}')
+    return {
+        'module': module,
+        'total_ms': target[-1]['cumulative_us'] / 1000,
+        'entries': entries,
+    }
+
+
+def check_budget(module='app', budget_ms=DEFAULT_BUDGET_MS, runs=3,
+                 compile_sources=False, lazy_modules=LAZY_MODULES):
+    results = [
+        measure_importtime(module, compile_sources=compile_sources)
+        for _ in range(runs)
+    ]
+    best = min(results, key=lambda r: r['total_ms'])
+    imported = {e['module'] for e in best['entries']}
+
+    failures = []
+    if best['total_ms'] > budget_ms:
+        failures.append(
+            f'cold import {best["total_ms"]:.1f} ms > budget {budget_ms} ms')
+    for name in lazy_modules:
+        if name in imported:
+            failures.append(f'{name} is imported eagerly')
+    best['failures'] = failures
+    return best
+
+
+def print_report(result, top=15):
+    print(f'Cold import of {result["module"]}: {result["total_ms"]:.1f} ms')
+    print(f'{"self ms":>9} {"cumul ms":>9}  module')
+    slowest = sorted(
+        result['entries'], key=lambda e: e['self_us'], reverse=True)[:top]
+    for e in slowest:
+        print(
+            f'{e["self_us"] / 1000:9.2f} {e["cumulative_us"] / 1000:9.2f}  '
+            f'{e["module"]}'
+        )
+    for failure in result['failures']:
+        log.error(failure)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Reports the cold import time of the Logginator handler '
+                    'and fails when it exceeds a budget.'
+    )
+    parser.add_argument(
+        '--budget-ms', '-B',
+        type=float,
+        default=float(os.getenv('LOGGINATOR_IMPORT_BUDGET_MS',
+                                DEFAULT_BUDGET_MS)),
+        help=f'Import time budget in ms. Defaults to {DEFAULT_BUDGET_MS}',
+    )
+    parser.add_argument(
+        '--runs', '-N',
+        type=int,
+        default=3,
+        help='Fresh interpreters to start, the fastest one is reported.'
+    )
+    parser.add_argument(
+        '--compile',
+        action='store_true',
+        help='Ignore cached bytecode so sources are compiled as well.'
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=15,
+        help='Number of slowest modules to list.'
+    )
+    pargs = parser.parse_args()
+
+    result = check_budget(
+        budget_ms=pargs.budget_ms,
+        runs=pargs.runs,
+        compile_sources=pargs.compile,
+    )
+    print_report(result, top=pargs.top)
+    sys.exit(1 if result['failures'] else 0)
@@ -32,8 +32,6 @@ parser.add_argument(
     version='%(prog)s 2.1.2'
     )
 
-args = parser.parse_args()
-
 
 def download_csv_file(url):
     try:
@@ -95,6 +93,7 @@ def write_items(items):
 
 
 if __name__ == '__main__':
+    args = parser.parse_args()
     url = args.url
     download_csv_file(url)
     filename = 'file.csv'
@@ -47,26 +47,30 @@ parser.add_argument(
     version='%(prog)s 1.0.0'
     )
 
-args = parser.parse_args()
+
+def plan_renames(target_dir, file_pattern, new_name):
+    files_to_rename = [
+        f for f in os.listdir(target_dir)
+        if re.search(file_pattern, f)
+        ]
+    logger.debug(files_to_rename)
+    renames = []
+    for count, file in enumerate(files_to_rename, start=1):
+        filename, file_extension = os.path.splitext(file)
+        renames.append((file, new_name + str(count) + file_extension))
+    return renames
 
 
 # Main Method
-def main():
+def main(args):
     try:
-        files_to_rename = [
-            f for f in os.listdir(args.target_dir)
-            if re.search(args.file_pattern, f)
-            ]
-        count = 0
-        logger.debug(files_to_rename)
+        renames = plan_renames(
+            args.target_dir, args.file_pattern, args.new_name)
     except (FileNotFoundError, FileExistsError) as e:
         logger.critical(f"Error: {e}")
         sys.exit(1)
-    for file in files_to_rename:
-        count += 1
-        filename, file_extension = os.path.splitext(file)
+    for file, new_filename in renames:
         logger.debug(f"File: {file}")
-        new_filename = args.new_name + str(count) + file_extension
         try:
             os.rename(
                 os.path.join(args.target_dir, file),
@@ -89,4 +93,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    main(parser.parse_args())
@@ -1,13 +1,54 @@
+import base64
+import hashlib
+import json
+import os
 import subprocess as sp
 import shutil as sh
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pathlib import Path
 
+import boto3
+from botocore.exceptions import ClientError
+
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 PACKAGE_DIR = SCRIPT_DIR.joinpath('package')
 LAMBDA_SCRIPT = SCRIPT_DIR.joinpath('lambda_function.py')
 LAMBDA_PACKAGE = SCRIPT_DIR.joinpath('function.zip')
+BUILD_DIR = SCRIPT_DIR.joinpath('build')
+
+# Fixed timestamp for zip entries so identical sources give identical hashes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Distributions already installed in the Lambda python runtime
+RUNTIME_PACKAGES = {
+    'boto3',
+    'botocore',
+    's3transfer',
+    'jmespath',
+    'python_dateutil',
+    'six',
+}
+STRIP_DIRS = {
+    'tests',
+    'test',
+    'docs',
+    'doc',
+    'examples',
+    '__pycache__',
+}
+STRIP_SUFFIXES = {
+    '.pyi',
+    '.rst',
+    '.md',
+    '.c',
+    '.h',
+    '.pyx',
+}
+DEFAULT_PYTHON_VERSION = '3.8'
 
 
 def run(command, *args):
@@ -16,7 +57,7 @@ def run(command, *args):
         ' '.join(args),
     ])
     print(f'Exec -> {cmd}')
-    sp.run([cmd], shell=True)
+    return sp.run([cmd], shell=True).returncode
 
 
 def cleanup():
@@ -29,16 +70,345 @@ def cleanup():
         LAMBDA_SCRIPT.unlink()
 
 
-def main(function_name, script_name, requirements=None):
-    cleanup()
+def parse_manifest(manifest_file):
+    require_keys = {
+        'function_name',
+        'script_name',
+    }
+    optional_keys = {
+        'requirements',
+        'slim',
+        'python_version',
+    }
+    manifest_file = Path(manifest_file).resolve()
+    with open(manifest_file) as fh:
+        conf = json.loads(fh.read())
+
+    functions = []
+    for spec in conf.get('functions', []):
+        keys = set(spec.keys())
+        if not require_keys <= keys or keys - require_keys - optional_keys:
+            raise KeyError(f'Invalid manifest entry: {spec}')
+        # Paths in the manifest are relative to the manifest itself
+        spec = dict(spec)
+        spec['script_name'] = manifest_file.parent.joinpath(
+            spec['script_name'])
+        if spec.get('requirements'):
+            spec['requirements'] = manifest_file.parent.joinpath(
+                spec['requirements'])
+        functions.append(spec)
+
+    if not functions:
+        raise KeyError('Invalid manifest: no functions listed.')
+    return functions
+
+
+def write_package(source_dir, zip_path):
+    source_dir = Path(source_dir)
+    files = sorted(p for p in source_dir.rglob('*') if p.is_file())
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for path in files:
+            info = zipfile.ZipInfo(
+                path.relative_to(source_dir).as_posix(),
+                date_time=ZIP_DATE_TIME,
+            )
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zf.writestr(info, path.read_bytes(), compresslevel=9)
+    return zip_path
+
+
+def dir_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file())
+
+
+def _dist_name(dist_info):
+    # 'python_dateutil-2.8.1.dist-info' -> 'python_dateutil'
+    return dist_info.name.split('-')[0].lower().replace('-', '_')
+
+
+def remove_runtime_packages(package_dir, runtime_dir=None,
+                            runtime_packages=RUNTIME_PACKAGES):
+    # Files are moved to runtime_dir when given, which stands in for the
+    # runtime's own copies when import times are measured
+    root = Path(package_dir).resolve()
+    removed = []
+    parents = set()
+
+    def take(path):
+        if runtime_dir:
+            target = Path(runtime_dir).joinpath(path.relative_to(root))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            sh.move(str(path), str(target))
+        elif path.is_dir():
+            sh.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink()
+
+    for dist_info in root.glob('*.dist-info'):
+        if _dist_name(dist_info) not in runtime_packages:
+            continue
+        record = dist_info.joinpath('RECORD')
+        if record.exists():
+            for line in record.read_text().splitlines():
+                entry = Path(line.split(',')[0])
+                # RECORD is package data, never follow it out of package_dir
+                if entry.is_absolute() or '..' in entry.parts:
+                    print(f'Slim -> ignoring unsafe RECORD path {entry}')
+                    continue
+                target = root.joinpath(entry)
+                if root not in target.resolve().parents:
+                    continue
+                if target.is_file() and dist_info not in target.parents:
+                    take(target)
+                    parents.add(target.parent)
+        take(dist_info)
+        removed.append(_dist_name(dist_info))
+
+    # Drop only the directories the RECORD cleanup left empty
+    for path in sorted(parents, key=lambda p: len(p.parts), reverse=True):
+        while path != root and path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+            path = path.parent
+    return removed
+
+
+def strip_package(package_dir):
+    package_dir = Path(package_dir)
+    for path in sorted(package_dir.rglob('*'), reverse=True):
+        if not path.exists() or path.parent == package_dir and path.is_file():
+            continue
+        if path.is_dir() and path.name in STRIP_DIRS:
+            sh.rmtree(path, ignore_errors=True)
+        elif path.is_file() and path.suffix in STRIP_SUFFIXES:
+            path.unlink()
+
+
+def find_python(python_version):
+    current = f'{sys.version_info.major}.{sys.version_info.minor}'
+    if python_version == current:
+        return sys.executable
+    return sh.which(f'python{python_version}')
+
+
+def precompile_package(package_dir, python):
+    # Unchecked-hash pycs never go stale on the read-only /var/task and keep
+    # the zip reproducible, so CodeSha256 change detection still works
+    res = sp.run([
+        python, '-m', 'compileall', '-q',
+        '--invalidation-mode', 'unchecked-hash',
+        '-d', '/var/task',
+        str(package_dir),
+    ])
+    return res.returncode == 0
+
+
+def parse_importtime(stderr, module):
+    # '-X importtime' lines: 'import time: self [us] | cumulative | name'
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        # Nested imports are indented further, the top-level one is not
+        if len(fields) == 3 and fields[2].rstrip() == f' {module}':
+            return int(fields[1]) / 1e6
+    return None
+
+
+def measure_import_time(package_dir, python, module='lambda_function', runs=3,
+                        runtime_dir=None):
+    # -X importtime times the import alone, leaving out interpreter startup.
+    # runtime_dir comes after package_dir on the path, like the runtime's
+    # packages do in Lambda, and -s keeps the user site out of the way
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        str(p) for p in [package_dir, runtime_dir] if p)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    timings = []
+    for _ in range(runs):
+        res = sp.run(
+            [python, '-s', '-X', 'importtime', '-c', f'import {module}'],
+            cwd=package_dir, env=env,
+            stdout=sp.PIPE, stderr=sp.PIPE, universal_newlines=True,
+        )
+        if res.returncode != 0:
+            print(f'Import of {module} failed: {res.stderr.strip()[-500:]}')
+            return None
+        timing = parse_importtime(res.stderr, module)
+        if timing is None:
+            return None
+        timings.append(timing)
+    return min(timings)
+
+
+def slim_package(package_dir, python_version=DEFAULT_PYTHON_VERSION):
+    python = find_python(python_version)
+    # The removed packages are kept next to the package, precompiled like
+    # the runtime's copies, so both timings resolve them from the same place
+    runtime_dir = Path(package_dir).parent.joinpath('runtime')
+    before_size = dir_size(package_dir)
+    before_time = measure_import_time(
+        package_dir, python, runtime_dir=runtime_dir) if python else None
+
+    removed = remove_runtime_packages(package_dir, runtime_dir)
+    strip_package(package_dir)
+    if python:
+        precompile_package(package_dir, python)
+        if runtime_dir.is_dir():
+            precompile_package(runtime_dir, python)
+    else:
+        print(f'python{python_version} not found, skipping precompilation')
+
+    after_size = dir_size(package_dir)
+    after_time = measure_import_time(
+        package_dir, python, runtime_dir=runtime_dir) if python else None
+    sh.rmtree(runtime_dir, ignore_errors=True)
+
+    report = {
+        'removed': removed,
+        'size_before': before_size,
+        'size_after': after_size,
+        'import_before': before_time,
+        'import_after': after_time,
+    }
+    print(f'Slim -> removed runtime packages: {", ".join(removed) or "none"}')
+    print(f'Slim -> size {before_size / 2**20:.2f} MiB '
+          f'-> {after_size / 2**20:.2f} MiB')
+    if before_time is not None and after_time is not None:
+        print(f'Slim -> import {before_time * 1000:.1f} ms '
+              f'-> {after_time * 1000:.1f} ms')
+    return report
+
+
+def build_function(function_name, script_name, requirements=None,
+                   slim=False, python_version=DEFAULT_PYTHON_VERSION):
+    build_dir = BUILD_DIR.joinpath(function_name)
+    package_dir = build_dir.joinpath('package')
+    zip_path = build_dir.joinpath('function.zip')
+
+    if build_dir.exists():
+        sh.rmtree(build_dir, ignore_errors=True)
+    package_dir.mkdir(parents=True)
 
     # Install the requirements
     if requirements:
+        code = run(
+            'pip install',
+            '--quiet',
+            '--no-compile',
+            f'--target {package_dir}',
+            f'-r {requirements}',
+        )
+        # A package missing dependencies would only fail at import in Lambda
+        if code != 0:
+            raise RuntimeError(
+                f'pip install for {function_name} failed with exit code {code}')
+
+    sh.copy2(script_name, package_dir.joinpath(LAMBDA_SCRIPT.name))
+    if slim:
+        slim_package(package_dir, python_version)
+    return write_package(package_dir, zip_path)
+
+
+def package_sha256(zip_path):
+    # Same encoding Lambda uses for CodeSha256
+    digest = hashlib.sha256(Path(zip_path).read_bytes()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def deployed_sha256(lambda_client, function_name):
+    try:
+        res = lambda_client.get_function_configuration(
+            FunctionName=function_name)
+    except ClientError as err:
+        if err.response['Error']['Code'] == 'ResourceNotFoundException':
+            return None
+        raise
+    return res.get('CodeSha256')
+
+
+def release_function(lambda_client, spec, force=False, slim=False,
+                     python_version=DEFAULT_PYTHON_VERSION):
+    function_name = spec['function_name']
+    spec = dict(spec)
+    spec['slim'] = spec.get('slim', slim)
+    spec['python_version'] = spec.get('python_version', python_version)
+    zip_path = build_function(**spec)
+    local_sha = package_sha256(zip_path)
+
+    if not force and local_sha == deployed_sha256(lambda_client, function_name):
+        print(f'Skip -> {function_name} is up to date ({local_sha})')
+        return False
+
+    print(f'Upload -> {function_name} ({local_sha})')
+    lambda_client.update_function_code(
+        FunctionName=function_name,
+        ZipFile=zip_path.read_bytes(),
+    )
+    return True
+
+
+def deploy_manifest(manifest_file, workers=None, force=False, region_name=None,
+                    slim=False, python_version=DEFAULT_PYTHON_VERSION):
+    functions = parse_manifest(manifest_file)
+    lambda_client = boto3.client('lambda', region_name=region_name)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(release_function, lambda_client, spec, force, slim,
+                        python_version):
+                spec['function_name']
+            for spec in functions
+        }
+        for future in as_completed(futures):
+            function_name = futures[future]
+            try:
+                results[function_name] = future.result()
+            except Exception as err:
+                print(f'Failed -> {function_name}: {err}')
+                results[function_name] = None
+
+    sh.rmtree(BUILD_DIR, ignore_errors=True)
+
+    uploaded = [k for k, v in results.items() if v]
+    skipped = [k for k, v in results.items() if v is False]
+    failed = [k for k, v in results.items() if v is None]
+    print(
+        f'Uploaded {len(uploaded)}, skipped {len(skipped)}, '
+        f'failed {len(failed)}'
+    )
+    return results
+
+
+def main(function_name, script_name, requirements=None,
+         slim=False, python_version=DEFAULT_PYTHON_VERSION):
+    if slim:
+        zip_path = build_function(
+            function_name, script_name, requirements,
+            slim=True, python_version=python_version,
+        )
         run(
+            'aws lambda update-function-code',
+            f'--function-name {function_name}',
+            f'--zip-file fileb://{zip_path}',
+        )
+        sh.rmtree(BUILD_DIR, ignore_errors=True)
+        return
+
+    cleanup()
+
+    # Install the requirements
+    if requirements:
+        code = run(
             'pip install',
             f'--target {PACKAGE_DIR}',
             f'-r {requirements}',
         )
+        if code != 0:
+            cleanup()
+            raise RuntimeError(
+                f'pip install for {function_name} failed with exit code {code}')
 
     # Create the package
     run(
@@ -72,18 +442,67 @@ if __name__ == '__main__':
     )
     parser.add_argument(
         'function_name',
+        nargs='?',
         help='Lambda function name',
     )
     parser.add_argument(
         'script_name',
+        nargs='?',
         help='Python script',
     )
     parser.add_argument(
         '-r', '--requirements',
         help='Python requirements file',
     )
-    args = parser.parse_args()
-    main(
-        args.function_name, args.script_name,
-        requirements=args.requirements
+    parser.add_argument(
+        '-m', '--manifest',
+        help='JSON manifest listing several functions to deploy',
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of functions to build and upload at once (manifest only)',
+    )
+    parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='Upload even if the deployed code is unchanged (manifest only)',
     )
+    parser.add_argument(
+        '-s', '--slim',
+        action='store_true',
+        help='Leave out runtime-provided packages, strip tests/docs/unused '
+             'botocore data and precompile bytecode',
+    )
+    parser.add_argument(
+        '-p', '--python-version',
+        default=DEFAULT_PYTHON_VERSION,
+        help='Lambda runtime python version used for precompilation '
+             '(default for manifest entries without "python_version")',
+    )
+    parser.add_argument(
+        '--region-name',
+        help='Region of the lambda functions (manifest only)',
+    )
+    args = parser.parse_args()
+
+    if args.manifest:
+        results = deploy_manifest(
+            args.manifest,
+            workers=args.workers,
+            force=args.force,
+            region_name=args.region_name,
+            slim=args.slim,
+            python_version=args.python_version,
+        )
+        sys.exit(1 if None in results.values() else 0)
+    elif args.function_name and args.script_name:
+        main(
+            args.function_name, args.script_name,
+            requirements=args.requirements,
+            slim=args.slim,
+            python_version=args.python_version,
+        )
+    else:
+        parser.error('function_name and script_name are required '
+                     'unless --manifest is given')
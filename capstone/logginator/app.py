@@ -1,10 +1,14 @@
 import os
 import json
+import random
 import logging
-import requests
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 
 logging.basicConfig(
@@ -18,6 +22,20 @@ debug_arn = os.getenv('TOPIC_DEBUG_ARN')
 warning_arn = os.getenv('TOPIC_WARNING_ARN')
 error_arn = os.getenv('TOPIC_ERROR_ARN')
 critical_arn = os.getenv('TOPIC_CRITICAL_ARN')
+retention_days = int(os.getenv('LOG_RETENTION_DAYS', '30'))
+
+# A day's writes are spread over this many by_day index partitions
+LOG_DAY_SHARDS = 10
+
+ROLLUP_TABLE = 'application_logs_rollups_jed'
+# Rollup buckets are prefixes of the str(datetime) log timestamps
+ROLLUP_BUCKETS = {
+    'minute': 16,
+    'hour': 13,
+}
+
+# Client-side rate limiting backs off when DynamoDB or SNS start throttling
+retry_config = Config(retries={'mode': 'adaptive', 'max_attempts': 10})
 
 
 def lambda_handler(event, context):
@@ -31,8 +49,26 @@ def lambda_handler(event, context):
     return process_log_events(log_event)
 
 
+# Clients are created on first use and reused by warm invocations
+@lru_cache(maxsize=None)
+def get_sns_client():
+    return boto3.client('sns', config=retry_config)
+
+
+@lru_cache(maxsize=None)
+def get_logs_table():
+    ddb = boto3.resource('dynamodb', config=retry_config)
+    return ddb.Table('application_logs_jed')
+
+
+@lru_cache(maxsize=None)
+def get_rollups_table():
+    ddb = boto3.resource('dynamodb', config=retry_config)
+    return ddb.Table(ROLLUP_TABLE)
+
+
 def publish_sns_message(topic_arn, message):
-    sns = boto3.client('sns')
+    sns = get_sns_client()
     params = {
         'TopicArn': topic_arn,
         'Message': message,
@@ -42,19 +78,59 @@ def publish_sns_message(topic_arn, message):
 
 
 def save_to_ddb(log_event):
-    ddb = boto3.resource('dynamodb')
-    api_table = ddb.Table('application_logs_jed')
+    api_table = get_logs_table()
+    now = datetime.now()
     keys = {
         'log_level': log_event['log_level'],
-        'timestamp': str(datetime.now())
+        'timestamp': str(now)
     }
     log_event.update(keys)
+    # log_day ('YYYY-MM-DD#N') feeds the by_day index, expires_at the TTL
+    shard = random.randrange(LOG_DAY_SHARDS)
+    log_event['log_day'] = f"{now.strftime('%Y-%m-%d')}#{shard}"
+    if retention_days:
+        expires = now + timedelta(days=retention_days)
+        log_event['expires_at'] = int(expires.timestamp())
     api_table.put_item(Item=log_event)
-    return api_table.get_item(Key=keys)['Item']
+    return log_event
+
+
+def rollup_keys(log_event):
+    for name, size in ROLLUP_BUCKETS.items():
+        rollup = f"{log_event['log_level']}#" \
+            f"{log_event['source_application']}#{name}"
+        yield rollup, log_event['timestamp'][:size]
+
+
+def update_rollups(log_events):
+    # Events sharing a rollup bucket become a single atomic ADD.
+    # ADD is not idempotent: if an update reaches DynamoDB but its response
+    # is lost, the adaptive retry applies it again and the bucket overcounts,
+    # as does a redelivered Lambda event. Rollups are approximate counts;
+    # exact figures come from the logs table
+    counts = Counter(key for e in log_events for key in rollup_keys(e))
+    table = get_rollups_table()
+    expires = datetime.now() + timedelta(days=retention_days)
+    for (rollup, bucket), count in counts.items():
+        params = {
+            'Key': {'rollup': rollup, 'bucket': bucket},
+            'UpdateExpression': 'ADD event_count :n',
+            'ExpressionAttributeValues': {':n': count},
+        }
+        if retention_days:
+            params['UpdateExpression'] += \
+                ' SET expires_at = if_not_exists(expires_at, :exp)'
+            params['ExpressionAttributeValues'][':exp'] = \
+                int(expires.timestamp())
+        table.update_item(**params)
+    return len(counts)
 
 
 def send_critical_email(log_event):
     if os.getenv('DEVOPS_EMAIL'):
+        # Only CRITICAL events need requests, keep it off the cold start path
+        import requests
+
         payload = {
             "to": os.getenv('DEVOPS_EMAIL'),
             "subject": f"CRITICAL ERROR @ {log_event['source_application']}",
@@ -86,6 +162,11 @@ def process_log_events(log_event):
             'message': "Invalid Log Level"
         }
     save_to_ddb(log_event)
+    try:
+        update_rollups([log_event])
+    except ClientError:
+        # The raw log is already stored, rollups are best effort
+        log.exception('Failed to update rollups')
     return {
         'statusCode': 200,
         'logEvent': log_event
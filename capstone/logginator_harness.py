@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import uuid
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import boto3
+from moto import mock_aws
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s %(module)s %(lineno)d - %(message)s')
+log = logging.getLogger()
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+LOGGINATOR_DIR = SCRIPT_DIR.joinpath('logginator')
+MANAGE_DIR = SCRIPT_DIR.parent.joinpath('aws_management_files')
+LOGS_TABLEDEF = MANAGE_DIR.joinpath('capstone-jed-logs-tabledef.json')
+ROLLUPS_TABLEDEF = MANAGE_DIR.joinpath('capstone-jed-rollups-tabledef.json')
+LOGS_PATH = '/logs'
+EMAIL_PATH = '/email'
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+REQUIRED_FIELDS = ['log_level', 'message', 'details', 'source_application']
+
+
+class LambdaContext:
+    function_name = 'logginator-local'
+    function_version = '$LATEST'
+    memory_limit_in_mb = 128
+    timeout_ms = 3000
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+        self._start = time.monotonic()
+
+    def get_remaining_time_in_millis(self):
+        elapsed = (time.monotonic() - self._start) * 1000
+        return max(0, int(self.timeout_ms - elapsed))
+
+
+def setup_aws_stubs(region='ap-southeast-1'):
+    # moto patches botocore for the whole process, so every handler thread
+    # talks to the same in-memory SNS and DynamoDB
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ['AWS_DEFAULT_REGION'] = region
+    mock = mock_aws()
+    mock.start()
+
+    sns = boto3.client('sns', region_name=region)
+    for level in LOG_LEVELS:
+        topic = sns.create_topic(Name=f'logginator-{level.lower()}')
+        os.environ[f'TOPIC_{level}_ARN'] = topic['TopicArn']
+
+    # Same table definition as the deployed table, indexes and TTL included
+    if str(MANAGE_DIR) not in sys.path:
+        sys.path.insert(0, str(MANAGE_DIR))
+    import dynamo_manage
+    for tabledef in [LOGS_TABLEDEF, ROLLUPS_TABLEDEF]:
+        dynamo_manage.create_dynamo_table(
+            **dynamo_manage.parse_tabledef(tabledef))
+    return mock
+
+
+def load_handler():
+    # app reads the topic ARNs at import, so import it after the stubs exist
+    if str(LOGGINATOR_DIR) not in sys.path:
+        sys.path.insert(0, str(LOGGINATOR_DIR))
+    import app
+    return app
+
+
+def validate_event(event):
+    # Mirrors the JSON schema on the API Gateway method
+    if not isinstance(event, dict):
+        return False
+    return all(isinstance(event.get(k), str) for k in REQUIRED_FIELDS)
+
+
+class LogginatorRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        path = self.path.rstrip('/')
+
+        if path == EMAIL_PATH:
+            self.server.count_email()
+            self.send_json(200, {'sent': True})
+            return
+        if path != LOGS_PATH:
+            self.send_json(403, {'message': 'Missing Authentication Token'})
+            return
+
+        try:
+            event = json.loads(body)
+        except ValueError:
+            event = None
+        if not validate_event(event):
+            self.send_json(400, {'message': 'Invalid request body'})
+            return
+
+        try:
+            res = self.server.handler(event, LambdaContext())
+        except Exception as err:
+            log.error(f'Handler failed: {err!r}')
+            self.send_json(502, {'message': 'Internal server error'})
+            return
+        self.send_json(200, res)
+
+
+class LogginatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler):
+        super().__init__(address, LogginatorRequestHandler)
+        self.handler = handler
+        self.emails_sent = 0
+        self._lock = threading.Lock()
+
+    def count_email(self):
+        with self._lock:
+            self.emails_sent += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_harness(host='127.0.0.1', port=0, region='ap-southeast-1'):
+    mock = setup_aws_stubs(region)
+    server = LogginatorServer((host, port), None)
+    # The email stub lives on the same server as the logs endpoint
+    os.environ['EMAIL_SENDER_API'] = f'{server.url}{EMAIL_PATH}'
+    os.environ.setdefault('DEVOPS_EMAIL', 'devops@example.com')
+    server.handler = load_handler().lambda_handler
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, mock
+
+
+def stop_harness(server, mock):
+    server.shutdown()
+    server.server_close()
+    mock.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Serves the Logginator lambda_handler locally behind an '
+                    'API Gateway-like endpoint, with SNS and DynamoDB '
+                    'stubbed by moto.'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+    )
+    parser.add_argument(
+        '--port', '-P',
+        type=int,
+        default=8080,
+    )
+    parser.add_argument(
+        '--region-name', '-R',
+        default='ap-southeast-1',
+    )
+    pargs = parser.parse_args()
+
+    server, mock = start_harness(pargs.host, pargs.port, pargs.region_name)
+    log.info(f'Logginator listening on {server.url}{LOGS_PATH}')
+    log.info(f'Email stub listening on {server.url}{EMAIL_PATH}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    log.info(f'Emails sent: {server.emails_sent}')
+    stop_harness(server, mock)
+    sys.exit(0)
@@ -0,0 +1,202 @@
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+import requests
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] %(levelname)s %(module)s %(lineno)d - %(message)s')
+log = logging.getLogger()
+
+
+DEFAULT_MIX = 'DEBUG=20,INFO=60,WARNING=12,ERROR=7,CRITICAL=1'
+PERCENTILES = [50, 90, 95, 99, 99.9]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        level, weight = part.split('=')
+        weights[level.strip().upper()] = float(weight)
+    return weights
+
+
+def synthetic_events(mix, seed=None):
+    rng = random.Random(seed)
+    levels = list(mix.keys())
+    weights = list(mix.values())
+    count = 0
+    while True:
+        count += 1
+        level = rng.choices(levels, weights)[0]
+        message = f'{level.lower()} event {count}'
+        yield {
+            'log_level': level,
+            'message': message,
+            'details': f'Line {rng.randint(1, 500)}: {message}',
+            'source_application': f'app-{rng.randint(1, 8)}',
+        }
+
+
+def replay_events(events_file):
+    with open(events_file) as fh:
+        events = [json.loads(line) for line in fh if line.strip()]
+    return cycle(events)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    summary = {
+        f'p{p:g}': percentile(values, p) for p in PERCENTILES
+    }
+    summary['max'] = values[-1] if values else None
+    summary['count'] = len(values)
+    return summary
+
+
+def run_load(url, events, rps, duration, workers=32, timeout=10):
+    local = threading.local()
+    results = []
+    total = int(rps * duration)
+    interval = 1 / rps
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def send(scheduled, event):
+        ok = False
+        try:
+            res = session().post(url, json=event, timeout=timeout)
+            ok = res.status_code == 200
+        except requests.RequestException as err:
+            log.debug(f'Request failed: {err}')
+        # Measured from the scheduled send time so a backed up client does
+        # not hide server latency (no coordinated omission)
+        latency = time.perf_counter() - scheduled
+        results.append((event['log_level'], latency, ok))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, event in zip(range(total), events):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, scheduled, event)
+    elapsed = time.perf_counter() - start
+
+    by_level = defaultdict(list)
+    for level, latency, ok in results:
+        if ok:
+            by_level[level].append(latency)
+    ok_latencies = [lat for lats in by_level.values() for lat in lats]
+    errors = sum(1 for r in results if not r[2])
+    return {
+        'target_rps': rps,
+        'sent': len(results),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'throughput_rps': (len(results) - errors) / elapsed if elapsed else 0,
+        'latency_s': summarize(ok_latencies),
+        'levels': {k: summarize(v) for k, v in sorted(by_level.items())},
+    }
+
+
+def print_report(report):
+    print(
+        f'Sent {report["sent"]} requests in {report["elapsed_s"]:.2f}s, '
+        f'{report["errors"]} errors'
+    )
+    print(
+        f'Throughput {report["throughput_rps"]:.1f} req/s '
+        f'(target {report["target_rps"]:g})'
+    )
+    columns = [f'p{p:g}' for p in PERCENTILES] + ['max']
+    print(f'{"level":<10}{"count":>8}' + ''.join(f'{c:>10}' for c in columns))
+    rows = [('ALL', report['latency_s'])] + list(report['levels'].items())
+    for level, stats in rows:
+        cells = ''.join(
+            f'{stats[c] * 1000:>8.1f}ms' if stats[c] is not None else f'{"-":>10}'
+            for c in columns
+        )
+        print(f'{level:<10}{stats["count"]:>8}{cells}')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Replays mixed-level log events against a Logginator '
+                    'endpoint at a fixed rate and reports latency percentiles.'
+    )
+    parser.add_argument(
+        'url',
+        help='Logginator endpoint, e.g. http://127.0.0.1:8080/logs'
+    )
+    parser.add_argument(
+        '--rps', '-r',
+        type=float,
+        default=50,
+        help='Requests per second to send.'
+    )
+    parser.add_argument(
+        '--duration', '-d',
+        type=float,
+        default=10,
+        help='Seconds to run for.'
+    )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=32,
+        help='Concurrent connections.'
+    )
+    parser.add_argument(
+        '--mix', '-m',
+        default=DEFAULT_MIX,
+        help=f'Level weights for synthetic events. Defaults to {DEFAULT_MIX}'
+    )
+    parser.add_argument(
+        '--events', '-e',
+        help='JSON Lines file of log events to replay instead of --mix.'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='Seed for synthetic events.'
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Print the report as JSON.'
+    )
+    pargs = parser.parse_args()
+
+    if pargs.events:
+        events = replay_events(pargs.events)
+    else:
+        events = synthetic_events(parse_mix(pargs.mix), pargs.seed)
+
+    report = run_load(
+        pargs.url, events, pargs.rps, pargs.duration, pargs.workers)
+    if pargs.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(1 if report['errors'] else 0)
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+for path in [
+    REPO_DIR,
+    REPO_DIR.joinpath('capstone'),
+    REPO_DIR.joinpath('aws_management_files'),
+]:
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from aws_fixtures import aws  # noqa: E402,F401
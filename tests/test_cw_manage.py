@@ -0,0 +1,84 @@
+import pytest
+
+import cw_manage
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = cw_manage.open_log_cache(str(tmp_path.joinpath('cache.db')))
+    yield db
+    db.close()
+
+
+def test_missing_ranges_empty_cache():
+    assert cw_manage.missing_ranges([], 100, 200) == [(100, 200)]
+
+
+def test_missing_ranges_fully_covered():
+    assert cw_manage.missing_ranges([(50, 250)], 100, 200) == []
+    assert cw_manage.missing_ranges([(100, 200)], 100, 200) == []
+
+
+def test_missing_ranges_partial_overlap():
+    covered = [(0, 120), (150, 160), (190, 300)]
+    assert cw_manage.missing_ranges(covered, 100, 200) == [
+        (121, 149), (161, 189)]
+    assert cw_manage.missing_ranges([(150, 300)], 100, 200) == [(100, 149)]
+    assert cw_manage.missing_ranges([(0, 150)], 100, 200) == [(151, 200)]
+
+
+def test_missing_ranges_outside_request():
+    covered = [(0, 50), (300, 400)]
+    assert cw_manage.missing_ranges(covered, 100, 200) == [(100, 200)]
+
+
+def test_add_cached_range_merges_overlapping(db):
+    cw_manage.add_cached_range(db, 'group', '', 100, 200)
+    cw_manage.add_cached_range(db, 'group', '', 150, 300)
+    cw_manage.add_cached_range(db, 'group', '', 500, 600)
+    assert cw_manage.cached_ranges(db, 'group', '') == [
+        (100, 300), (500, 600)]
+
+
+def test_add_cached_range_merges_adjacent(db):
+    cw_manage.add_cached_range(db, 'group', '', 100, 200)
+    cw_manage.add_cached_range(db, 'group', '', 201, 300)
+    cw_manage.add_cached_range(db, 'group', '', 302, 400)
+    assert cw_manage.cached_ranges(db, 'group', '') == [
+        (100, 300), (302, 400)]
+    assert cw_manage.missing_ranges(
+        cw_manage.cached_ranges(db, 'group', ''), 0, 500) == [
+        (0, 99), (301, 301), (401, 500)]
+
+
+def test_add_cached_range_keeps_patterns_apart(db):
+    cw_manage.add_cached_range(db, 'group', 'ERROR', 100, 200)
+    cw_manage.add_cached_range(db, 'group', '', 300, 400)
+    assert cw_manage.cached_ranges(db, 'group', 'ERROR') == [(100, 200)]
+    assert cw_manage.cached_ranges(db, 'group', '') == [(300, 400)]
+
+
+def test_search_matches_log_terms_as_phrases(db):
+    messages = [
+        'GET api/v1/items request-id=abc',
+        'login from user@example.com',
+        'say "hello" world',
+        'unrelated line',
+    ]
+    with db:
+        db.executemany(
+            'INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [('group', '', str(i), 'stream', 1000 + i, None, m)
+             for i, m in enumerate(messages)])
+
+    def search(text, raw=False):
+        events = cw_manage.query_log_cache(
+            db, 'group', '', 0, 2000, search=text, raw_search=raw)
+        return [e['message'] for e in events]
+
+    assert search('request-id') == [messages[0]]
+    assert search('api/v1') == [messages[0]]
+    assert search('user@example.com') == [messages[1]]
+    assert search('"hello"') == [messages[2]]
+    assert search('login OR unrelated', raw=True) == [
+        messages[1], messages[3]]
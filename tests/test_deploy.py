@@ -0,0 +1,83 @@
+import json
+
+import boto3
+import pytest
+
+import deploy
+
+
+HANDLER = 'def lambda_handler(event, context):\n    return {}\n'
+
+
+@pytest.fixture
+def manifest(aws, tmp_path, monkeypatch):
+    monkeypatch.setattr(deploy, 'BUILD_DIR', tmp_path.joinpath('build'))
+    script = tmp_path.joinpath('handler.py')
+    script.write_text(HANDLER)
+    manifest_file = tmp_path.joinpath('manifest.json')
+    manifest_file.write_text(json.dumps({'functions': [
+        {'function_name': 'logginator', 'script_name': 'handler.py'},
+    ]}))
+
+    # Deployed from the same source, so the first deploy has nothing to do
+    zip_path = deploy.build_function('logginator', script)
+    role = boto3.client('iam').create_role(
+        RoleName='lambda-role', AssumeRolePolicyDocument='{}')['Role']['Arn']
+    boto3.client('lambda').create_function(
+        FunctionName='logginator',
+        Runtime='python3.8',
+        Role=role,
+        Handler='lambda_function.lambda_handler',
+        Code={'ZipFile': zip_path.read_bytes()},
+    )
+    return manifest_file
+
+
+def test_unchanged_function_is_skipped(manifest):
+    assert deploy.deploy_manifest(manifest) == {'logginator': False}
+    assert deploy.deploy_manifest(manifest) == {'logginator': False}
+
+
+def test_changed_source_is_uploaded(manifest):
+    manifest.parent.joinpath('handler.py').write_text(
+        HANDLER.replace('{}', '{"changed": True}'))
+    assert deploy.deploy_manifest(manifest) == {'logginator': True}
+    # The new code is live, so the next deploy skips it again
+    assert deploy.deploy_manifest(manifest) == {'logginator': False}
+
+
+def test_missing_function_fails_alone(manifest):
+    conf = json.loads(manifest.read_text())
+    conf['functions'].append(
+        {'function_name': 'not-deployed', 'script_name': 'handler.py'})
+    manifest.write_text(json.dumps(conf))
+
+    results = deploy.deploy_manifest(manifest, workers=2)
+    assert results == {'logginator': False, 'not-deployed': None}
+
+
+def test_remove_runtime_packages_moves_record_files(tmp_path):
+    package_dir = tmp_path.joinpath('package')
+    runtime_dir = tmp_path.joinpath('runtime')
+    for name in ['boto3/__init__.py', 'boto3/data/s3/x.json',
+                 'requests/__init__.py']:
+        package_dir.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+        package_dir.joinpath(name).write_text('')
+    # Empty before the cleanup, so it is not the cleanup's to remove
+    package_dir.joinpath('requests', 'empty').mkdir()
+    dist_info = package_dir.joinpath('boto3-1.17.0.dist-info')
+    dist_info.mkdir()
+    dist_info.joinpath('RECORD').write_text(
+        'boto3/__init__.py,,\n'
+        'boto3/data/s3/x.json,,\n'
+        'boto3-1.17.0.dist-info/RECORD,,\n'
+        '../../bin/outside,,\n'
+    )
+
+    removed = deploy.remove_runtime_packages(package_dir, runtime_dir)
+    assert removed == ['boto3']
+    assert not package_dir.joinpath('boto3').exists()
+    assert not package_dir.joinpath('boto3-1.17.0.dist-info').exists()
+    assert package_dir.joinpath('requests', 'empty').is_dir()
+    assert runtime_dir.joinpath('boto3', 'data', 's3', 'x.json').is_file()
+    assert runtime_dir.joinpath('boto3-1.17.0.dist-info', 'RECORD').is_file()
@@ -0,0 +1,114 @@
+from decimal import Decimal
+
+import pytest
+
+import dynamo_manage
+
+
+@pytest.fixture
+def products_table(aws):
+    conf = dynamo_manage.parse_tabledef(
+        dynamo_manage.Path(__file__).resolve().parent.parent.joinpath(
+            'aws_management_files', 'products_tabledef.json'))
+    return dynamo_manage.create_dynamo_table(**conf)
+
+
+def test_csv_numeric_looking_string_key(products_table, tmp_path):
+    csv_file = tmp_path.joinpath('products.csv')
+    csv_file.write_text('category,sku,price,code\nbooks,12345,9.5,007\n')
+
+    types = dynamo_manage.column_types('products', {'code': 'S'})
+    items = list(dynamo_manage.read_items(csv_file, types=types))
+    assert items == [{
+        'category': 'books',
+        'sku': '12345',
+        'price': Decimal('9.5'),
+        'code': '007',
+    }]
+
+    stats = dynamo_manage.load_items(
+        'products', items, workers=1, target_utilisation=0)
+    assert stats['failed'] == 0
+    item = products_table.get_item(
+        Key={'category': 'books', 'sku': '12345'})['Item']
+    assert item['price'] == Decimal('9.5')
+
+
+def test_convert_cell_explicit_types():
+    assert dynamo_manage.convert_cell('12345', 'S') == '12345'
+    assert dynamo_manage.convert_cell('1e3', 'N') == Decimal('1e3')
+    assert dynamo_manage.convert_cell('12345') == Decimal('12345')
+    assert dynamo_manage.convert_cell('0012') == '0012'
+
+
+def test_make_throttle_modes(products_table):
+    adaptive = dynamo_manage.make_throttle('products', 'write')
+    assert adaptive.rate is None
+    adaptive.throttled()
+    assert adaptive.rate is not None
+
+    assert dynamo_manage.make_throttle('products', 'write', 0) is None
+
+    paced = dynamo_manage.make_throttle('products', 'write', 0.8)
+    assert paced.ceiling == 5 * 0.8
+
+
+def test_update_products_skips_rows_without_values(products_table):
+    with products_table.batch_writer() as batch:
+        for i in range(3):
+            batch.put_item(Item={'category': 'books', 'sku': f'sku-{i}'})
+
+    updates = [
+        {'category': 'books', 'sku': 'sku-0', 'stock': 5},
+        {'category': 'books', 'sku': 'sku-1'},
+        {'category': 'books', 'sku': 'sku-2', 'stock': 7},
+    ]
+    stats = dynamo_manage.update_products(updates, workers=1)
+    assert stats['written'] == 2
+    assert stats['failed'] == 0
+    assert stats['skipped'] == 1
+
+    for sku, stock in [('sku-0', 5), ('sku-2', 7)]:
+        item = products_table.get_item(
+            Key={'category': 'books', 'sku': sku})['Item']
+        assert item['stock'] == stock
+
+
+def test_build_update_needs_attributes():
+    with pytest.raises(ValueError):
+        dynamo_manage.build_update({'category': 'books', 'sku': 'sku-1'})
+
+
+def test_load_items_dedupes_on_table_key(products_table, tmp_path):
+    csv_file = tmp_path.joinpath('products.csv')
+    csv_file.write_text(
+        'category,sku,stock\n'
+        'books,sku-1,1\n'
+        'books,sku-2,2\n'
+        'books,sku-1,3\n'
+    )
+    types = dynamo_manage.column_types('products')
+    items = dynamo_manage.read_items(csv_file, types=types)
+
+    stats = dynamo_manage.load_items(
+        'products', items, workers=1, target_utilisation=0)
+    assert stats['failed'] == 0
+    assert stats['written'] == 2
+    item = products_table.get_item(
+        Key={'category': 'books', 'sku': 'sku-1'})['Item']
+    assert item['stock'] == 3
+
+
+def test_query_products_cache(products_table):
+    dynamo_manage.query_cache.clear()
+    products_table.put_item(Item={'category': 'books', 'sku': 'sku-1'})
+    key_expr = dynamo_manage.Key('category').eq('books')
+
+    assert len(list(dynamo_manage.query_products(key_expr, cached=True))) == 1
+    products_table.put_item(Item={'category': 'books', 'sku': 'sku-2'})
+    # Served from the cache until it expires, unless asked for consistency
+    assert len(list(dynamo_manage.query_products(key_expr, cached=True))) == 1
+    assert len(list(dynamo_manage.query_products(
+        key_expr, cached=True, consistent=True))) == 2
+    assert len(list(dynamo_manage.query_products(key_expr))) == 2
+    dynamo_manage.query_cache.clear()
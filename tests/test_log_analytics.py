@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+import log_analytics
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # Every rollup read as (granularity, first, last), each counting 1
+    calls = []
+
+    def rollup_series(level, application, granularity, first, last):
+        calls.append((granularity, first, last))
+        return [(first, 1)]
+
+    monkeypatch.setattr(log_analytics, 'rollup_series', rollup_series)
+    return calls
+
+
+def count(start, stop):
+    return log_analytics.rollup_count(
+        'ERROR', 'app', datetime.fromisoformat(start),
+        datetime.fromisoformat(stop))
+
+
+def test_range_inside_one_hour(reads):
+    count('2021-06-01 09:10:00', '2021-06-01 09:50:00')
+    assert reads == [('minute', '2021-06-01 09:10', '2021-06-01 09:50')]
+
+
+def test_exact_hour_boundaries(reads):
+    count('2021-06-01 09:00:00', '2021-06-01 11:59:00')
+    assert reads == [('hour', '2021-06-01 09', '2021-06-01 11')]
+
+
+def test_ragged_ends_use_minutes(reads):
+    count('2021-06-01 09:45:00', '2021-06-01 11:14:00')
+    assert reads == [
+        ('minute', '2021-06-01 09:45', '2021-06-01 09:59'),
+        ('hour', '2021-06-01 10', '2021-06-01 10'),
+        ('minute', '2021-06-01 11:00', '2021-06-01 11:14'),
+    ]
+
+
+def test_range_crossing_midnight(reads):
+    count('2021-06-01 23:30:00', '2021-06-02 01:10:00')
+    assert reads == [
+        ('minute', '2021-06-01 23:30', '2021-06-01 23:59'),
+        ('hour', '2021-06-02 00', '2021-06-02 00'),
+        ('minute', '2021-06-02 01:00', '2021-06-02 01:10'),
+    ]
+
+
+def test_seconds_round_down_to_whole_minutes(reads):
+    count('2021-06-01 09:00:30', '2021-06-01 09:59:10')
+    assert reads == [('hour', '2021-06-01 09', '2021-06-01 09')]
+
+    reads.clear()
+    count('2021-06-01 09:05:59', '2021-06-01 09:05:01')
+    assert reads == [('minute', '2021-06-01 09:05', '2021-06-01 09:05')]
+
+
+def test_heavy_hitters_keeps_frequent_keys():
+    hitters = log_analytics.HeavyHitters(n=2, capacity=4)
+    events = ['a'] * 50 + ['b'] * 30 + [f'rare {i}' for i in range(200)]
+    events += ['a'] * 10 + [None] * 3
+    for key in events:
+        hitters.add(key)
+    assert [key for key, _ in hitters.top()] == ['a', 'b']
+    assert len(hitters.candidates) == 4
+
+
+def test_iter_log_day_queries_every_shard(monkeypatch):
+    calls = []
+
+    def query_table_many(table_name, key_exprs, workers, **params):
+        calls.append((key_exprs, params['index_name']))
+        return iter([
+            {'log_level': 'ERROR', 'source_application': 'app'},
+            {'log_level': 'INFO', 'source_application': 'app'},
+            {'log_level': 'ERROR', 'source_application': 'other'},
+        ])
+
+    monkeypatch.setattr(log_analytics, 'query_table_many', query_table_many)
+    items = list(log_analytics.iter_log_items(
+        levels=['ERROR'], application='app', day='2021-06-01'))
+    assert items == [{'log_level': 'ERROR', 'source_application': 'app'}]
+
+    key_exprs, index_name = calls[0]
+    assert index_name == 'by_day'
+    assert [e.get_expression()['values'][1] for e in key_exprs] == [
+        f'2021-06-01#{shard}' for shard in range(log_analytics.LOG_DAY_SHARDS)]
@@ -0,0 +1,38 @@
+import time
+
+from parallel_iter import submit_bounded
+
+
+def test_submit_bounded_reports_every_batch():
+    results = {}
+
+    def work(batch):
+        if batch == 3:
+            raise ValueError('bad batch')
+        return batch * 10
+
+    def done(batch, result, err):
+        results[batch] = str(err) if err else result
+
+    submit_bounded(work, range(6), done, workers=2)
+    assert results == {0: 0, 1: 10, 2: 20, 3: 'bad batch', 4: 40, 5: 50}
+
+
+def test_submit_bounded_limits_batches_in_flight():
+    counts = {'submitted': 0, 'finished': 0, 'most': 0}
+
+    def batches():
+        for i in range(20):
+            # Whatever has been handed out but not finished is in flight
+            counts['most'] = max(
+                counts['most'], counts['submitted'] - counts['finished'])
+            counts['submitted'] += 1
+            yield i
+
+    def done(batch, result, err):
+        counts['finished'] += 1
+
+    submit_bounded(
+        lambda batch: time.sleep(0.01), batches(), done, workers=2, backlog=3)
+    assert counts['finished'] == 20
+    assert counts['most'] <= 3
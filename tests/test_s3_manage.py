@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import s3_manage
+
+
+def test_sync_keeps_manifest_when_one_upload_fails(aws, tmp_path, monkeypatch):
+    s3_manage._handles.clear()
+    client = s3_manage.get_s3_client()
+    client.create_bucket(
+        Bucket='sync-bucket',
+        CreateBucketConfiguration={'LocationConstraint': aws})
+    local_dir = tmp_path.joinpath('src')
+    local_dir.mkdir()
+    for name in ['a.txt', 'b.txt', 'c.txt']:
+        local_dir.joinpath(name).write_text(f'contents of {name}')
+
+    upload_file = client.upload_file
+
+    def flaky_upload(filename, bucket, key, **kwargs):
+        if key == 'b.txt':
+            raise s3_manage.S3UploadFailedError('Failed to upload b.txt')
+        return upload_file(filename, bucket, key, **kwargs)
+
+    monkeypatch.setattr(client, 'upload_file', flaky_upload)
+    stats = s3_manage.sync('sync-bucket', local_dir, workers=2)
+    assert stats['transferred'] == 2
+    assert stats['failed'] == 1
+
+    manifest = json.loads(
+        local_dir.joinpath(s3_manage.SYNC_MANIFEST).read_text())
+    assert set(manifest['files']) == {'a.txt', 'b.txt', 'c.txt'}
+
+    # Only the failed file is sent again
+    monkeypatch.setattr(client, 'upload_file', upload_file)
+    stats = s3_manage.sync('sync-bucket', local_dir, workers=2)
+    assert stats['transferred'] == 1
+    assert stats['failed'] == 0
+    assert stats['unchanged'] == 2
+
+
+def test_bucket_exists_does_not_cache_misses(aws):
+    s3_manage._handles.clear()
+    assert not s3_manage.bucket_exists('late-bucket')
+    s3_manage.get_s3_client().create_bucket(
+        Bucket='late-bucket',
+        CreateBucketConfiguration={'LocationConstraint': aws})
+    assert s3_manage.bucket_exists('late-bucket')
+
+
+def test_bucket_exists_raises_on_forbidden(aws, monkeypatch):
+    s3_manage._handles.clear()
+    client = s3_manage.get_s3_client()
+
+    def head_bucket(Bucket):
+        raise s3_manage.ClientError(
+            {'Error': {'Code': '403', 'Message': 'Forbidden'}}, 'HeadBucket')
+
+    monkeypatch.setattr(client, 'head_bucket', head_bucket)
+    with pytest.raises(s3_manage.ClientError):
+        s3_manage.bucket_exists('someone-elses-bucket')
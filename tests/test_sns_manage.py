@@ -0,0 +1,43 @@
+from botocore.exceptions import EndpointConnectionError
+
+import sns_manage
+
+
+class FlakyClient:
+    # First call publishes half the batch, later calls lose the connection
+    def __init__(self):
+        self.calls = []
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        self.calls.append([e['Id'] for e in PublishBatchRequestEntries])
+        if len(self.calls) > 1:
+            raise EndpointConnectionError(endpoint_url='https://sns')
+        ids = [e['Id'] for e in PublishBatchRequestEntries]
+        return {
+            'Successful': [{'Id': i} for i in ids[:5]],
+            # A repeated Id is ignored rather than failing the batch
+            'Failed': [
+                {'Id': i, 'Code': 'InternalError', 'SenderFault': False}
+                for i in ids[5:] + ids[5:6]
+            ],
+        }
+
+
+def test_publish_batch_transport_error_fails_only_pending(monkeypatch):
+    monkeypatch.setattr(sns_manage.time, 'sleep', lambda s: None)
+    entries = [{'Id': str(i), 'Message': f'm{i}'} for i in range(10)]
+    client = FlakyClient()
+
+    published, failed = sns_manage.publish_batch(
+        client, 'arn:topic', entries, retries=2)
+    assert published == 5
+    assert sorted(f['Id'] for f in failed) == ['5', '6', '7', '8', '9']
+    assert {f['Code'] for f in failed} == {'EndpointConnectionError'}
+    assert client.calls[1] == ['5', '6', '7', '8', '9']
+
+
+def test_iter_batches_by_size_and_bytes():
+    entries = [{'Message': 'x' * 100000}] * 5 + [{'Message': 'y'}] * 12
+    batches = list(sns_manage.iter_batches(
+        entries, sns_manage.PUBLISH_BATCH_SIZE, sns_manage.PUBLISH_BATCH_BYTES))
+    assert [len(b) for b in batches] == [2, 2, 10, 3]